@@ -1,48 +1,295 @@
+from typing import Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, func, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.config import config
+from core.dependencies import find_card_dependencies
+from core.duplicates import find_card_duplicates, find_duplicate_clusters
+from core.pagination import paginate_async
 from core.parsers import scanner
-from models.cards import Card, CardCodeResponse, CardResponse
-from db.session import get_db
-
+from core.sampling import REVIEWED_STATUSES, pick_random_card
+from core.serialization import (
+    CARD_CODE_COLUMNS,
+    CARD_COLUMNS,
+    ORJSONResponse,
+    card_code_to_dict,
+    card_to_dict,
+    cards_to_dicts,
+)
+from core.signatures import lookup_signatures
+from core.swipes import find_swipe_action, swipe_buffer
+from models.cards import (
+    Card,
+    CardCodeResponse,
+    CardDuplicate,
+    CardFeedResponse,
+    CardPage,
+    CardSeverity,
+    CardSignature,
+    CardStatus,
+    DuplicateCluster,
+    SignatureLookupRequest,
+)
+from models.dependencies import CardDependencies, FileImportResponse
+from models.repositories import Repository
+from models.swipes import SwipeRequest, SwipeResponse
+from db.session import get_async_db
 
 router = APIRouter(prefix="/cards", tags=["cards"])
 
 
-@router.get("/", response_model=list[CardResponse])
-def get_cards(db: Session = Depends(get_db)):
-    cards = db.exec(select(Card)).all()
-    if not cards:
+async def _card_with_code(
+    db: AsyncSession, card: Card, rev: Optional[str] = None
+) -> ORJSONResponse:
+    """Собирает ответ с кодом карточки; файл читается вне event loop"""
+    repo = await db.get(Repository, card.repository_id)
+    if not repo:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Репозиторий {card.repository_id} не найден",
+        )
+    try:
+        code = await run_in_threadpool(scanner.read_card_code, repo, card, rev)
+    except ValueError as exc:
+        if not rev:
+            raise
+        raise HTTPException(status_code=404, detail=str(exc))
+    return ORJSONResponse(card_code_to_dict(card, code))
+
+
+@router.get("/", response_model=CardPage)
+async def get_cards(
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    repository_id: Optional[UUID] = None,
+    status: Optional[CardStatus] = None,
+    severity: Optional[CardSeverity] = None,
+    kind: Optional[str] = None,
+    file_path_prefix: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = select(*CARD_COLUMNS)
+    if repository_id:
+        query = query.where(Card.repository_id == repository_id)
+    if status:
+        query = query.where(Card.status == status)
+    if severity:
+        query = query.where(Card.severity == severity)
+    if kind:
+        query = query.where(Card.kind == kind)
+    if file_path_prefix:
+        query = query.where(
+            col(Card.file_path).startswith(file_path_prefix, autoescape=True)
+        )
+
+    try:
+        cards, next_cursor = await paginate_async(db, query, Card, limit, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not cards and not cursor:
         http_exception = HTTPException(status_code=400, detail="Карточки не найдены")
         raise http_exception
-    return cards
+    return ORJSONResponse({"items": cards_to_dicts(cards), "next_cursor": next_cursor})
+
+
+@router.post("/signatures", response_model=list[CardSignature])
+async def get_signatures(
+    request: SignatureLookupRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Сигнатуры для подсказок редактора: все имена открытого файла за один
+    запрос, из сохранённых сканером сигнатур и импортов
+    """
+    found = await lookup_signatures(
+        db, request.repository_id, request.file_path, request.names
+    )
+    return ORJSONResponse(
+        [
+            {
+                "name": name,
+                "id": row.id,
+                "file_path": row.file_path,
+                "kind": row.kind,
+                "full_name": row.full_name,
+                "signature": row.signature,
+            }
+            for name, row in found.items()
+        ]
+    )
 
 
 @router.get("/{card_id}", response_model=CardCodeResponse)
-def get_card(card_id: UUID, db: Session = Depends(get_db)):
-    card = db.exec(select(Card).where(Card.id == card_id)).first()
+async def get_card(
+    card_id: UUID,
+    rev: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    card = await db.get(Card, card_id)
     if not card:
         http_exception = HTTPException(
             status_code=404,
             detail=f"Карточка {card_id} не найдена",
         )
         raise http_exception
-    code = scanner.get_code(db, card_id)
-    response_data = {**card.dict(), **code}
-    return CardCodeResponse(**response_data)
+    return await _card_with_code(db, card, rev)
 
 
 @router.get("/repo/{repo_id}/random", response_model=CardCodeResponse)
-def get_random_card_from_repo(repo_id: UUID, db: Session = Depends(get_db)):
-    card = db.exec(
-        select(Card).where(Card.repository_id == repo_id).order_by(func.random())
-    ).first()
+async def get_random_card_from_repo(
+    repo_id: UUID,
+    exclude_reviewed: bool = False,
+    weighted: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    card = await pick_random_card(
+        db,
+        repo_id,
+        exclude_statuses=REVIEWED_STATUSES if exclude_reviewed else (),
+        weighted=weighted,
+    )
     if not card:
         http_exception = HTTPException(
             status_code=404,
             detail=f"Карточки для репозитория {repo_id} не найдены",
         )
         raise http_exception
-    code = scanner.get_code(db, card.id)
-    response_data = {**card.dict(), **code}
-    return CardCodeResponse(**response_data)
+    return await _card_with_code(db, card)
+
+
+@router.get("/repo/{repo_id}/feed", response_model=CardFeedResponse)
+async def get_card_feed(
+    repo_id: UUID,
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[int] = None,
+    exclude_reviewed: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Следующие карточки репозитория вместе с кодом одной пачкой.
+
+    next_cursor передаётся в следующий запрос, чтобы клиент мог подгрузить
+    новую пачку в фоне, пока пользователь свайпает текущую.
+    """
+    query = select(*CARD_CODE_COLUMNS).where(Card.repository_id == repo_id)
+    if cursor is not None:
+        query = query.where(Card.seq > cursor)
+    else:
+        query = query.where(col(Card.seq).is_not(None))
+    if exclude_reviewed:
+        query = query.where(col(Card.status).not_in(REVIEWED_STATUSES))
+    cards = (await db.exec(query.order_by(Card.seq).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(cards) > limit:
+        cards = cards[:limit]
+        next_cursor = cards[-1].seq
+
+    repos = {}
+    for repository_id in {card.repository_id for card in cards}:
+        repos[repository_id] = await db.get(Repository, repository_id)
+    codes = await run_in_threadpool(scanner.read_codes, repos, cards)
+    items = [
+        card_code_to_dict(card, codes[card.id]) for card in cards if card.id in codes
+    ]
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
+
+
+@router.get("/{card_id}/duplicates", response_model=list[CardDuplicate])
+async def get_card_duplicates(
+    card_id: UUID,
+    threshold: float = Query(default=0.8, gt=0, le=1),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Копии и похожие на карточку фрагменты кода во всех репозиториях"""
+    card = await db.get(Card, card_id)
+    if not card:
+        raise HTTPException(status_code=404, detail=f"Карточка {card_id} не найдена")
+    duplicates = await find_card_duplicates(db, card, threshold, limit)
+    return ORJSONResponse(
+        [
+            {**card_to_dict(other), "similarity": similarity}
+            for other, similarity in duplicates
+        ]
+    )
+
+
+@router.get("/repo/{repo_id}/duplicates", response_model=list[DuplicateCluster])
+async def get_duplicate_clusters(
+    repo_id: UUID,
+    threshold: float = Query(default=0.8, gt=0, le=1),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Кластеры точных копий и похожих карточек репозитория"""
+    clusters = await find_duplicate_clusters(db, repo_id, threshold)
+    return ORJSONResponse(
+        [
+            {"similarity": similarity, "items": cards_to_dicts(cards)}
+            for similarity, cards in clusters
+        ]
+    )
+
+
+@router.get("/{card_id}/dependencies", response_model=CardDependencies)
+async def get_card_dependencies(
+    card_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Карточка зависимостей: импорты файла, используемые карточкой сущности
+    и сущности, которые используют её, — по графу, построенному сканером
+    """
+    card = await db.get(Card, card_id)
+    if not card:
+        raise HTTPException(status_code=404, detail=f"Карточка {card_id} не найдена")
+    imports, references, used_by = await find_card_dependencies(db, card)
+    return ORJSONResponse(
+        {
+            "imports": [
+                {name: getattr(item, name) for name in FileImportResponse.model_fields}
+                for item in imports
+            ],
+            "references": [
+                {**card_to_dict(row), "name": row.name} for row in references
+            ],
+            "used_by": [{**card_to_dict(row), "name": row.name} for row in used_by],
+        }
+    )
+
+
+@router.post("/{card_id}/swipe", response_model=SwipeResponse, status_code=202)
+async def swipe_card(
+    card_id: UUID,
+    request: SwipeRequest,
+    idempotency_key: Optional[str] = Header(default=None, min_length=1, max_length=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Свайп карточки: статус меняется отложенно, пачкой с другими свайпами.
+
+    Повтор запроса с тем же ключом идемпотентности (заголовок
+    Idempotency-Key или поле запроса) не применяет свайп второй раз, а
+    ключ, уже использованный для другого действия с карточкой, — 409.
+    Ключа нет в памяти процесса — он проверяется по журналу свайпов.
+    Существование карточки не проверяется: свайп несуществующей ничего
+    не меняет.
+    """
+    key = idempotency_key or request.idempotency_key
+    if key is not None and not swipe_buffer.knows(card_id, key):
+        stored = await find_swipe_action(db, card_id, key)
+        if stored is not None:
+            swipe_buffer.remember(card_id, stored, key)
+    if swipe_buffer.pending() >= config.SWIPE_MAX_PENDING:
+        # Буфер переполнен — БД не успевает; запрос ждёт записи
+        try:
+            await run_in_threadpool(swipe_buffer.flush)
+        except SQLAlchemyError:
+            raise HTTPException(
+                status_code=503,
+                detail="Свайпы временно не сохраняются, повторите позже",
+            )
+    try:
+        response = swipe_buffer.add(card_id, request.action, key)
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return ORJSONResponse(response.model_dump(), status_code=202)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from fastapi.concurrency import run_in_threadpool
+from core.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    payload, content_type = await run_in_threadpool(render_metrics)
+    return Response(content=payload, media_type=content_type)
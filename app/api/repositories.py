@@ -1,17 +1,31 @@
+import asyncio
+import json
 import os
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 import requests
 from sqlmodel import Session, select
-from db.session import get_db
+from db.session import engine, get_db
+from uuid import UUID
+from models.jobs import JobResponse, JobStatus
 from models.repositories import (
     Repository,
     RepositoryStatus,
     RepositoryCreate,
-    RepositoryResponse,
+    RepositoryPage,
 )
-import git
 from core.config import config
+from core.git_clone import (
+    clone_repository as git_clone,
+    find_reference_repository,
+    update_repository,
+)
+from core.jobs import Job, job_manager
+from core.pagination import paginate
 from core.parsers import scanner
+from core.parsers.git_source import forget_git_repo
 from core.utils.logger import setup as setup_logger
 from models import utcnow
 
@@ -52,61 +66,167 @@ def save_repository_to_db(
         return None
 
 
-def update_repo_data(existing_repo_db, repo_path, db: Session):
+def update_repo_data(
+    existing_repo_db, repo_path, db: Session, job: Job = None, rev: str = None
+):
     existing_repo_db.updated_at = utcnow()
     db.add(existing_repo_db)
     db.commit()
     db.refresh(existing_repo_db)
+    if job:
+        job.repository_id = existing_repo_db.id
+        job.set_status(JobStatus.scanning)
     scanner.scan_repo(
         repo_path=repo_path,
         repository_id=existing_repo_db.id,
+        incremental=True,
+        progress=job.progress if job else None,
+        rev=rev,
     )
 
 
-@router.get("/", status_code=status.HTTP_200_OK)
-def list_repositories(db: Session = Depends(get_db)):
-    repositories = db.exec(select(Repository)).all()
-    return repositories
+@router.get("/", response_model=RepositoryPage, status_code=status.HTTP_200_OK)
+def list_repositories(
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        repositories, next_cursor = paginate(
+            db, select(Repository), Repository, limit, cursor
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return RepositoryPage(items=repositories, next_cursor=next_cursor)
 
 
-@router.post(
-    "/clone", response_model=RepositoryResponse, status_code=status.HTTP_201_CREATED
-)
-def clone_repository(repo: RepositoryCreate, db: Session = Depends(get_db)):
-    owner = repo.repo_full_name.split("/")[0]
-    repo_name = repo.repo_full_name.split("/")[1]
+def clone_and_scan(job: Job, repo_full_name: str, rev: str = None):
+    """Клонирует (или обновляет) репозиторий и сканирует его — выполняется в фоне"""
+    owner = repo_full_name.split("/")[0]
+    repo_name = repo_full_name.split("/")[1]
     repo_url = f"https://github.com/{owner}/{repo_name}"
-    response = requests.head(repo_url)
+    response = requests.head(repo_url, timeout=30)
     if response.status_code != 200:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Репозиторий не найден: {repo_url} (HTTP {response.status_code})",
+        raise ValueError(
+            f"Репозиторий не найден: {repo_url} (HTTP {response.status_code})"
         )
     repo_path = config.TEMP_REPO_PATH + f"/{owner}/{repo_name}"
 
-    existing_repo_db = db.exec(
-        select(Repository).where(Repository.repo_full_name == repo.repo_full_name)
-    ).first()
+    with Session(engine) as db:
+        existing_repo_db = db.exec(
+            select(Repository).where(Repository.repo_full_name == repo_full_name)
+        ).first()
 
-    if os.path.isdir(repo_path):
-        repo_instance = git.Repo(repo_path)
-        repo_instance.remotes.origin.pull()
+        job.set_status(JobStatus.cloning)
+        # Объекты могли быть перепакованы или клон пересоздан
+        forget_git_repo(repo_path)
+        if os.path.isdir(repo_path):
+            update_repository(repo_path, depth=config.CLONE_DEPTH)
+        else:
+            reference = None
+            if config.CLONE_SHARE_OBJECTS:
+                reference = find_reference_repository(
+                    config.TEMP_REPO_PATH, repo_full_name
+                )
+            git_clone(
+                repo_url,
+                repo_path,
+                depth=config.CLONE_DEPTH,
+                blobless=config.CLONE_BLOBLESS,
+                sparse_extensions=scanner.EXTENSIONS if config.CLONE_SPARSE else None,
+                reference=reference,
+                dissociate=config.CLONE_DISSOCIATE,
+            )
+            logger.info(f"Репозиторий {repo_full_name} успешно клонирован")
 
-        if existing_repo_db:
-            update_repo_data(existing_repo_db, repo_path, db)
-            return RepositoryResponse(
-                message=f"Данные репозитория {repo.repo_full_name} обновлены в БД"
+        if not existing_repo_db:
+            existing_repo_db = save_repository_to_db(
+                repo_full_name=repo_full_name, db=db
             )
-        else:
-            new_repo = save_repository_to_db(repo_full_name=repo.repo_full_name, db=db)
-            update_repo_data(new_repo, repo_path, db)
-    else:
-        git.Repo.clone_from(repo_url, repo_path)
-        logger.info(f"Репозиторий {repo.repo_full_name} успешно клонирован")
-        if existing_repo_db:
-            update_repo_data(existing_repo_db, repo_path, db)
-        else:
-            new_repo = save_repository_to_db(repo_full_name=repo.repo_full_name, db=db)
-            update_repo_data(new_repo, repo_path, db)
+            if existing_repo_db is None:
+                raise ValueError(f"Не удалось сохранить репозиторий {repo_full_name}")
+        update_repo_data(existing_repo_db, repo_path, db, job, rev)
+
 
-    return RepositoryResponse(message="Клонирование успешно выполнено")
+@router.post("/clone", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def clone_repository(repo: RepositoryCreate):
+    if len(repo.repo_full_name.split("/")) != 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ожидается имя вида owner/repo: {repo.repo_full_name}",
+        )
+    try:
+        job = job_manager.submit(
+            repo.repo_full_name,
+            lambda job: clone_and_scan(job, repo.repo_full_name, repo.rev),
+            rev=repo.rev,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    return job.to_response()
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: UUID):
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Задача {job_id} не найдена",
+        )
+    return job.to_response()
+
+
+def _sse(event: str, data, event_id: Optional[int] = None) -> str:
+    """Одно событие в формате text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _job_events(job: Job, request: Request, last_event_id: int):
+    last_progress = None
+    while True:
+        # Статус читаем до журнала, чтобы не потерять финальное событие
+        finished = job.finished
+        for event_id, event, data in job.events_after(last_event_id):
+            last_event_id = event_id
+            yield _sse(event, data, event_id)
+        response = job.to_response()
+        if response.updated_at != last_progress:
+            last_progress = response.updated_at
+            yield _sse("progress", response)
+        if finished or await request.is_disconnected():
+            return
+        await asyncio.sleep(config.JOB_EVENTS_INTERVAL)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: UUID,
+    request: Request,
+    last_event_id: Optional[int] = Header(default=None),
+):
+    """Поток событий задачи (Server-Sent Events).
+
+    status — смена статуса (с repository_id после начала сканирования),
+    batch_committed — очередная пачка карточек зафиксирована и уже доступна
+    в /cards/repo/{repository_id}/feed, progress — снимок счётчиков не чаще
+    раза в JOB_EVENTS_INTERVAL. Поток закрывается после done или failed;
+    при переподключении EventSource присылает Last-Event-ID и получает
+    пропущенные события.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Задача {job_id} не найдена",
+        )
+    return StreamingResponse(
+        _job_events(job, request, last_event_id or 0),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -35,10 +35,138 @@ class ConfigSettings(BaseSettings):
         default=False,
         description="Включить логирование SQL-запросов (true/false)",
     )
+    DB_POOL_SIZE: int = Field(
+        default=10,
+        description="Количество постоянных соединений в пуле БД",
+    )
+    DB_MAX_OVERFLOW: int = Field(
+        default=20,
+        description="Количество дополнительных соединений сверх пула при пиковой нагрузке",
+    )
+    DB_POOL_TIMEOUT: int = Field(
+        default=30,
+        description="Сколько секунд ждать свободное соединение из пула",
+    )
+    DB_POOL_RECYCLE: int = Field(
+        default=1800,
+        description="Через сколько секунд пересоздавать соединение (-1 - никогда)",
+    )
+    DB_POOL_PRE_PING: bool = Field(
+        default=True,
+        description="Проверять соединение перед выдачей из пула (true/false)",
+    )
+    DB_STATEMENT_CACHE_SIZE: int = Field(
+        default=100,
+        description="Размер кэша подготовленных запросов asyncpg (0 - для pgbouncer в режиме transaction)",
+    )
     TEMP_REPO_PATH: str = Field(
         default="repositories",
         description="Папка для временных репозиториев при анализе",
     )
+    SCAN_WORKERS: int = Field(
+        default=1,
+        description="Количество процессов для разбора файлов при сканировании (1 - без пула)",
+    )
+    SCAN_CHUNK_SIZE: int = Field(
+        default=64,
+        description="Количество файлов в одной порции для процесса-обработчика",
+    )
+    CLONE_DEPTH: int = Field(
+        default=0,
+        description="Глубина клонирования истории (0 - полная история)",
+    )
+    CLONE_BLOBLESS: bool = Field(
+        default=False,
+        description="Частичный клон без blob-объектов, --filter=blob:none (true/false)",
+    )
+    CLONE_SPARSE: bool = Field(
+        default=False,
+        description="Sparse checkout только файлов поддерживаемых расширений (true/false)",
+    )
+    CLONE_SHARE_OBJECTS: bool = Field(
+        default=False,
+        description="Переиспользовать объекты склонированных форков через --reference (true/false)",
+    )
+    CLONE_DISSOCIATE: bool = Field(
+        default=False,
+        description="Копировать объекты из форка вместо ссылки на него, --dissociate (true/false)",
+    )
+    JOB_WORKERS: int = Field(
+        default=2,
+        description="Количество одновременно выполняемых задач клонирования и сканирования",
+    )
+    SCAN_DB_BATCH_SIZE: int = Field(
+        default=1000,
+        description="Количество карточек в одном пакетном запросе к БД при сканировании",
+    )
+    SCAN_STREAMING: bool = Field(
+        default=False,
+        description="Потоковая сверка карточек серверным курсором для очень больших репозиториев (true/false)",
+    )
+    SCAN_STREAM_BATCH_SIZE: int = Field(
+        default=5000,
+        description="Сколько существующих карточек читать за раз в потоковом режиме сканирования",
+    )
+    SCAN_COMMIT_BATCH_SIZE: int = Field(
+        default=2000,
+        description="Сколько карточек сканер записывает до фиксации транзакции (0 - одна транзакция в конце)",
+    )
+    JOB_EVENTS_INTERVAL: float = Field(
+        default=0.5,
+        description="Интервал в секундах между событиями прогресса в потоке /repositories/jobs/{id}/events",
+    )
+    SWIPE_FLUSH_SIZE: int = Field(
+        default=500,
+        description="Сколько свайпов накопить в буфере до записи в БД одним пакетом",
+    )
+    SWIPE_FLUSH_INTERVAL: float = Field(
+        default=1.0,
+        description="Максимальная задержка в секундах между свайпом и записью в БД",
+    )
+    SWIPE_MAX_PENDING: int = Field(
+        default=20000,
+        description="Предел буфера свайпов: при переполнении запрос ждёт записи в БД",
+    )
+    SWIPE_IDEMPOTENCY_CACHE_SIZE: int = Field(
+        default=100000,
+        description="Сколько последних ключей идемпотентности свайпов помнить в памяти процесса",
+    )
+    ANALYSIS_MAX_FUNCTION_STATEMENTS: int = Field(
+        default=40,
+        description="Порог числа инструкций функции для находки «слишком большая» (0 - не проверять)",
+    )
+    ANALYSIS_MAX_CLASS_STATEMENTS: int = Field(
+        default=200,
+        description="Порог числа инструкций класса для находки «слишком большой» (0 - не проверять)",
+    )
+    ANALYSIS_MAX_COMPLEXITY: int = Field(
+        default=10,
+        description="Порог цикломатической сложности функции (0 - не проверять)",
+    )
+    ANALYSIS_MAX_NESTING: int = Field(
+        default=4,
+        description="Порог глубины вложенности управляющих конструкций в функции (0 - не проверять)",
+    )
+    ANALYSIS_DUPLICATE_MIN_LINES: int = Field(
+        default=5,
+        description="Минимальная длина сущности в строках для находки «дублирование» (0 - не проверять)",
+    )
+    PARSE_CACHE_ENABLED: bool = Field(
+        default=True,
+        description="Включить дисковый кэш разбора файлов (true/false)",
+    )
+    PARSE_CACHE_MAX_MB: int = Field(
+        default=512,
+        description="Максимальный размер кэша разбора файлов в мегабайтах",
+    )
+    SOURCE_CACHE_MAX_ENTRIES: int = Field(
+        default=256,
+        description="Максимальное число файлов в кэше исходников для чтения карточек",
+    )
+    SOURCE_CACHE_MAX_MB: int = Field(
+        default=64,
+        description="Максимальный объём кэша исходников для чтения карточек в мегабайтах",
+    )
     LOG_PATH: str = Field(
         default="logs",
         description="Папка для логов приложения",
@@ -47,6 +175,30 @@ class ConfigSettings(BaseSettings):
         default=True,
         description="Включить режим отладки для логов (true/false)",
     )
+    LOG_JSON: bool = Field(
+        default=False,
+        description="Писать логи в формате JSON, одна запись на строку (true/false)",
+    )
+    LOG_MAX_MB: int = Field(
+        default=50,
+        description="Размер файла лога в мегабайтах до ротации (0 - без ротации по размеру)",
+    )
+    LOG_ROTATE_WHEN: str = Field(
+        default="",
+        description="Ротация лога по времени: midnight, H, D, W0-W6 (пусто - по размеру)",
+    )
+    LOG_BACKUP_COUNT: int = Field(
+        default=7,
+        description="Сколько старых файлов лога хранить после ротации",
+    )
+    LOG_QUEUE_SIZE: int = Field(
+        default=10000,
+        description="Размер очереди записей лога (при переполнении записи отбрасываются)",
+    )
+    LOG_DEBUG_SAMPLE_EVERY: int = Field(
+        default=1,
+        description="Писать каждое N-е DEBUG-сообщение из одного места в коде (1 - все)",
+    )
 
 
 IN_DOCKER = os.getenv("IN_DOCKER", "").lower() in ("1", "true", "yes")
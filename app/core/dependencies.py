@@ -0,0 +1,104 @@
+from typing import List, Tuple
+
+from sqlalchemy import and_, or_
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.serialization import CARD_COLUMNS
+from models.cards import Card
+from models.dependencies import CardReference, FileImport
+
+# Сколько строк ссылок читать для зависимостей и для использований карточки
+MAX_REFERENCES = 500
+
+
+def _unique_cards(rows: List) -> List:
+    """Одна строка на карточку, по порядку файла и имени"""
+    unique = {}
+    for row in rows:
+        unique.setdefault(row.id, row)
+    return sorted(unique.values(), key=lambda row: (row.file_path, row.full_name))
+
+
+def _most_specific(rows: List) -> List:
+    """Для каждого имени в коде — самая точная цель.
+
+    Ссылка a.B.method хранится и как B, и как B.method — если обе есть
+    среди карточек, остаётся метод.
+    """
+    best = {}
+    for row in rows:
+        current = best.get(row.name)
+        if current is None or len(row.full_name) > len(current.full_name):
+            best[row.name] = row
+    return _unique_cards(best.values())
+
+
+async def find_card_dependencies(
+    db: AsyncSession, card: Card
+) -> Tuple[List[FileImport], List, List]:
+    """Импорты файла карточки, карточки, на которые она ссылается, и те,
+    что ссылаются на неё, — запросы по индексам без разбора файлов.
+
+    Строки зависимостей и использований — колонки CardResponse и name,
+    имя, через которое ссылка записана в коде.
+    """
+    import_filter = col(FileImport.is_local).is_(False)
+    if card.start_line is not None:
+        # Импорты внутри самой карточки тоже её зависимости
+        import_filter = or_(
+            import_filter,
+            col(FileImport.line).between(card.start_line, card.end_line),
+        )
+    imports = (
+        await db.exec(
+            select(FileImport)
+            .where(
+                FileImport.repository_id == card.repository_id,
+                FileImport.file_path == card.file_path,
+                import_filter,
+            )
+            .order_by(FileImport.line)
+        )
+    ).all()
+
+    references = (
+        await db.exec(
+            select(*CARD_COLUMNS, CardReference.name)
+            .join(
+                CardReference,
+                and_(
+                    CardReference.repository_id == Card.repository_id,
+                    CardReference.target_file == Card.file_path,
+                    CardReference.target_name == Card.full_name,
+                ),
+            )
+            .where(
+                CardReference.repository_id == card.repository_id,
+                CardReference.file_path == card.file_path,
+                CardReference.full_name == card.full_name,
+            )
+            .limit(MAX_REFERENCES)
+        )
+    ).all()
+
+    used_by = (
+        await db.exec(
+            select(*CARD_COLUMNS, CardReference.name)
+            .join(
+                CardReference,
+                and_(
+                    CardReference.repository_id == Card.repository_id,
+                    CardReference.file_path == Card.file_path,
+                    CardReference.full_name == Card.full_name,
+                ),
+            )
+            .where(
+                CardReference.repository_id == card.repository_id,
+                CardReference.target_file == card.file_path,
+                CardReference.target_name == card.full_name,
+            )
+            .limit(MAX_REFERENCES)
+        )
+    ).all()
+    return list(imports), _most_specific(references), _unique_cards(used_by)
@@ -0,0 +1,197 @@
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlmodel import col, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.parsers.minhash import minhash_similarity
+from models.cards import Card
+
+# Корзины LSH крупнее этого размера — типовой шаблонный код
+# (пустые __init__, геттеры), попарно их не сравниваем
+MAX_BUCKET_SIZE = 100
+
+# Сколько кандидатов по LSH проверять для одной карточки
+MAX_CANDIDATES = 500
+
+# Фильтр по списку id одним параметром-массивом: id = ANY(:ids)
+_ids_param = bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True)))
+
+
+def _nested(left: Tuple, right: Tuple) -> bool:
+    """Одна сущность вложена в другую: тот же файл, строки одной внутри другой.
+
+    Класс похож на свой единственный большой метод, но это не дубликат.
+    Положение — (repository_id, file_path, start_line, end_line).
+    """
+    if left[:2] != right[:2] or None in left[2:] or None in right[2:]:
+        return False
+    return (left[2] <= right[2] and right[3] <= left[3]) or (
+        right[2] <= left[2] and left[3] <= right[3]
+    )
+
+
+def _location(card: Card) -> Tuple:
+    return card.repository_id, card.file_path, card.start_line, card.end_line
+
+
+class _DisjointSet:
+    """Объединение карточек в кластеры с минимальной похожестью связей"""
+
+    def __init__(self):
+        self.parent: Dict[UUID, UUID] = {}
+        self.similarity: Dict[UUID, float] = {}
+
+    def find(self, item: UUID) -> UUID:
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, left: UUID, right: UUID, similarity: float):
+        left_root, right_root = self.find(left), self.find(right)
+        merged = min(
+            similarity,
+            self.similarity.get(left_root, 1.0),
+            self.similarity.get(right_root, 1.0),
+        )
+        if left_root != right_root:
+            self.parent[right_root] = left_root
+        self.similarity[left_root] = merged
+
+    def clusters(self) -> List[Tuple[float, List[UUID]]]:
+        groups: Dict[UUID, List[UUID]] = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [
+            (self.similarity.get(root, 1.0), members)
+            for root, members in groups.items()
+            if len(members) > 1
+        ]
+
+
+async def find_card_duplicates(
+    db: AsyncSession, card: Card, threshold: float, limit: int
+) -> List[Tuple[Card, float]]:
+    """Ищет копии и похожие карточки во всех репозиториях.
+
+    Точные копии находятся по индексу ast_hash, похожие — по пересечению
+    LSH-корзин (GIN-индекс) с проверкой оценки похожести по MinHash.
+    Сущности, вложенные в карточку или содержащие её, дубликатами не считаются.
+    """
+    found: List[Tuple[Card, float]] = []
+    if card.ast_hash is not None:
+        exact = await db.exec(
+            select(Card)
+            .where(Card.ast_hash == card.ast_hash, Card.id != card.id)
+            .limit(limit)
+        )
+        found.extend((other, 1.0) for other in exact.all())
+
+    if card.lsh_bands and len(found) < limit:
+        candidates = await db.exec(
+            select(Card)
+            .where(
+                col(Card.lsh_bands).overlap(card.lsh_bands),
+                Card.id != card.id,
+                col(Card.ast_hash).is_distinct_from(card.ast_hash),
+            )
+            .limit(MAX_CANDIDATES)
+        )
+        near = []
+        for other in candidates.all():
+            if _nested(_location(card), _location(other)):
+                continue
+            similarity = minhash_similarity(card.minhash, other.minhash)
+            if similarity >= threshold:
+                near.append((other, similarity))
+        near.sort(key=lambda item: item[1], reverse=True)
+        found.extend(near[: limit - len(found)])
+    return found
+
+
+async def find_duplicate_clusters(
+    db: AsyncSession, repository_id: UUID, threshold: float
+) -> List[Tuple[float, List[Card]]]:
+    """Группирует карточки репозитория в кластеры копий и похожего кода.
+
+    Кандидаты — карточки с общим ast_hash или общей LSH-корзиной; пары из
+    корзин проверяются по оценке похожести MinHash, вложенные друг в друга
+    сущности одного файла не сравниваются. Кластеры возвращаются по
+    убыванию размера.
+    """
+    clusters = _DisjointSet()
+
+    exact_groups = await db.exec(
+        select(func.array_agg(Card.id))
+        .where(Card.repository_id == repository_id, col(Card.ast_hash).is_not(None))
+        .group_by(Card.ast_hash)
+        .having(func.count() > 1)
+    )
+    for ids in exact_groups.all():
+        for other in ids[1:]:
+            clusters.union(ids[0], other, 1.0)
+
+    bands = (
+        select(Card.id, func.unnest(Card.lsh_bands).label("band"))
+        .where(Card.repository_id == repository_id)
+        .subquery()
+    )
+    buckets = (
+        await db.exec(
+            select(func.array_agg(bands.c.id))
+            .group_by(bands.c.band)
+            .having(func.count() > 1, func.count() <= MAX_BUCKET_SIZE)
+        )
+    ).all()
+
+    candidate_ids = {card_id for ids in buckets for card_id in ids}
+    signatures: Dict[UUID, bytes] = {}
+    locations: Dict[UUID, Tuple] = {}
+    if candidate_ids:
+        rows = await db.exec(
+            select(
+                Card.id,
+                Card.minhash,
+                Card.repository_id,
+                Card.file_path,
+                Card.start_line,
+                Card.end_line,
+            ).where(Card.id == any_(_ids_param)),
+            params={"ids": list(candidate_ids)},
+        )
+        for card_id, minhash, *location in rows.all():
+            signatures[card_id] = minhash
+            locations[card_id] = tuple(location)
+
+    checked = set()
+    for ids in buckets:
+        ids = sorted(ids)
+        for i, left in enumerate(ids):
+            for right in ids[i + 1 :]:
+                if (left, right) in checked:
+                    continue
+                checked.add((left, right))
+                if _nested(locations[left], locations[right]):
+                    continue
+                similarity = minhash_similarity(signatures[left], signatures[right])
+                if similarity >= threshold:
+                    clusters.union(left, right, similarity)
+
+    groups = clusters.clusters()
+    if not groups:
+        return []
+    cards = await db.exec(
+        select(Card).where(Card.id == any_(_ids_param)),
+        params={"ids": [card_id for _, ids in groups for card_id in ids]},
+    )
+    by_id = {card.id: card for card in cards.all()}
+    result = [
+        (similarity, sorted((by_id[i] for i in ids), key=lambda c: c.seq or 0))
+        for similarity, ids in groups
+    ]
+    result.sort(key=lambda item: len(item[1]), reverse=True)
+    return result
@@ -0,0 +1,80 @@
+import glob
+import os
+from typing import Iterable, Optional
+
+import git
+
+
+def _sparse_patterns(extensions: Iterable[str]) -> list:
+    """Шаблоны sparse-checkout (non-cone): только файлы нужных расширений"""
+    return [f"*{ext}" for ext in sorted(extensions)]
+
+
+def clone_repository(
+    url: str,
+    path: str,
+    depth: int = 0,
+    blobless: bool = False,
+    sparse_extensions: Optional[Iterable[str]] = None,
+    reference: Optional[str] = None,
+    dissociate: bool = False,
+) -> git.Repo:
+    """Клонирует репозиторий, забирая только то, что нужно сканеру.
+
+    depth > 0 — неглубокий клон, blobless — частичный клон без blob-объектов
+    (они докачиваются при checkout), sparse_extensions — в рабочее дерево
+    попадают только файлы с этими расширениями, reference — соседний
+    клон, объекты которого переиспользуются через alternates.
+    Для локальных репозиториев url должен быть вида file://, иначе git
+    игнорирует depth и filter.
+    """
+    kwargs = {}
+    if depth > 0:
+        kwargs["depth"] = depth
+    if blobless:
+        kwargs["filter"] = "blob:none"
+    if reference:
+        kwargs["reference_if_able"] = reference
+        if dissociate:
+            kwargs["dissociate"] = True
+    if sparse_extensions is None:
+        return git.Repo.clone_from(url, path, **kwargs)
+
+    repo = git.Repo.clone_from(url, path, no_checkout=True, **kwargs)
+    repo.git.sparse_checkout("set", "--no-cone", *_sparse_patterns(sparse_extensions))
+    repo.git.checkout()
+    return repo
+
+
+def update_repository(path: str, depth: int = 0) -> git.Repo:
+    """Подтягивает изменения из origin для существующего клона"""
+    repo = git.Repo(path)
+    if depth <= 0 and not os.path.exists(os.path.join(repo.git_dir, "shallow")):
+        repo.remotes.origin.pull()
+        return repo
+
+    # В неглубоком клоне история не связана — merge невозможен,
+    # поэтому забираем свежий коммит ветки и переключаемся на него
+    branch = repo.active_branch.name
+    repo.git.fetch("origin", branch, depth=max(depth, 1))
+    repo.git.reset("--hard", "FETCH_HEAD")
+    return repo
+
+
+def find_reference_repository(root: str, repo_full_name: str) -> Optional[str]:
+    """Ищет уже склонированный форк с тем же именем репозитория.
+
+    Форки одного апстрима обычно называются одинаково и делят почти все
+    объекты. Неглубокие клоны не подходят: git не принимает их в --reference.
+    """
+    owner, repo_name = repo_full_name.split("/", 1)
+    for candidate in sorted(glob.glob(os.path.join(root, "*", repo_name))):
+        if os.path.basename(os.path.dirname(candidate)) == owner:
+            continue
+        git_dir = os.path.join(candidate, ".git")
+        if not os.path.isdir(git_dir):
+            continue
+        if os.path.exists(os.path.join(git_dir, "shallow")):
+            continue
+        return os.path.abspath(candidate)
+    return None
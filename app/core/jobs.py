@@ -0,0 +1,175 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from core.config import config
+from core.utils.logger import setup as setup_logger
+from models import utcnow
+from models.jobs import JobResponse, JobStatus
+
+logger = setup_logger(
+    name="JOBS",
+    log_path=config.LOG_PATH,
+    DEBUG=config.LOG_DEBUG,
+)
+
+# Сколько завершённых задач держать в памяти для запросов статуса
+_HISTORY_SIZE = 1000
+# Сколько последних событий задачи хранить для переподключения клиентов
+_EVENTS_SIZE = 1000
+# Счётчики прогресса, которые scan_repo передаёт в колбэк
+_COUNTERS = (
+    "files_discovered",
+    "files_parsed",
+    "entities_found",
+    "cards_committed",
+    "batches_committed",
+)
+
+
+class Job:
+    """Фоновая задача клонирования и сканирования репозитория"""
+
+    def __init__(self, key: str, rev: Optional[str] = None):
+        self.id = uuid4()
+        self.key = key
+        self.rev = rev
+        self.status = JobStatus.queued
+        self.repository_id: Optional[UUID] = None
+        self.files_discovered = 0
+        self.files_parsed = 0
+        self.entities_found = 0
+        self.cards_committed = 0
+        self.batches_committed = 0
+        self.error: Optional[str] = None
+        self.created_at = utcnow()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+        self._events: "deque[Tuple[int, str, Dict]]" = deque(maxlen=_EVENTS_SIZE)
+        self._last_event_id = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.done, JobStatus.failed)
+
+    def set_status(self, status: JobStatus, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.updated_at = utcnow()
+            self._add_event(
+                "status",
+                {
+                    "status": status.value,
+                    "repository_id": (
+                        str(self.repository_id) if self.repository_id else None
+                    ),
+                    "error": error,
+                },
+            )
+
+    def progress(self, event: str, **data):
+        """Колбэк прогресса для scan_repo: обновляет счётчики задачи.
+
+        Частые file_parsed только меняют счётчики, остальные события
+        (batch_committed) ещё и попадают в журнал для потока событий.
+        """
+        with self._lock:
+            for name in _COUNTERS:
+                if name in data:
+                    setattr(self, name, data[name])
+            self.updated_at = utcnow()
+            if event != "file_parsed":
+                self._add_event(event, data)
+
+    def _add_event(self, event: str, data: Dict):
+        self._last_event_id += 1
+        self._events.append((self._last_event_id, event, data))
+
+    def events_after(self, event_id: int) -> List[Tuple[int, str, Dict]]:
+        """События журнала с номером больше event_id"""
+        with self._lock:
+            return [item for item in self._events if item[0] > event_id]
+
+    def to_response(self) -> JobResponse:
+        with self._lock:
+            return JobResponse(
+                id=self.id,
+                repo_full_name=self.key,
+                rev=self.rev,
+                status=self.status,
+                repository_id=self.repository_id,
+                files_discovered=self.files_discovered,
+                files_parsed=self.files_parsed,
+                entities_found=self.entities_found,
+                cards_committed=self.cards_committed,
+                batches_committed=self.batches_committed,
+                error=self.error,
+                created_at=self.created_at,
+                updated_at=self.updated_at,
+            )
+
+
+class JobManager:
+    """Очередь задач с ограниченным пулом потоков.
+
+    Пока задача по ключу (repo_full_name) не завершена, повторные запросы
+    получают ту же задачу вместо новой; запрос другой ревизии того же
+    ключа — ValueError.
+    """
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._jobs: "OrderedDict[UUID, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, key: str, fn: Callable[[Job], None], rev: Optional[str] = None
+    ) -> Job:
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                if job.rev != rev:
+                    raise ValueError(
+                        f"Для {key} уже выполняется задача {job.id} "
+                        f"с ревизией {job.rev or 'по умолчанию'}"
+                    )
+                return job
+            job = Job(key, rev)
+            self._active[key] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > _HISTORY_SIZE:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.finished:
+                    break
+                del self._jobs[oldest_id]
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], None]):
+        try:
+            fn(job)
+            job.set_status(JobStatus.done)
+        except Exception as e:
+            logger.exception(f"Задача {job.id} ({job.key}) завершилась ошибкой")
+            job.set_status(JobStatus.failed, error=str(e))
+        finally:
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def get(self, job_id: UUID) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        # Ещё не начатые задачи отменяем, выполняющиеся дорабатывают сами
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_manager = JobManager(max_workers=config.JOB_WORKERS)
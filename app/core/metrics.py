@@ -0,0 +1,162 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from prometheus_client.registry import Collector
+
+from core.parsers.source_cache import source_cache
+from db.session import async_engine, engine
+
+REQUEST_LATENCY = Histogram(
+    "swipe_http_request_duration_seconds",
+    "Длительность HTTP-запросов по шаблону маршрута",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# walk — обход файлов, hash — чтение и хэш содержимого с поиском в кэше разбора,
+# parse — извлечение и анализ сущностей (время процессов-обработчиков суммируется),
+# db_sync — загрузка существующих карточек и запись изменений
+SCAN_STAGE_DURATION = Histogram(
+    "swipe_scan_stage_duration_seconds",
+    "Длительность этапов сканирования репозитория",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+SCAN_FILES = Counter(
+    "swipe_scan_files_total", "Разобранные при сканировании файлы", ["result"]
+)
+SCAN_ENTITIES = Counter(
+    "swipe_scan_entities_total", "Сущности, найденные при сканировании"
+)
+SCAN_FILES_PER_SECOND = Gauge(
+    "swipe_scan_files_per_second", "Скорость последнего сканирования, файлов в секунду"
+)
+SCAN_ENTITIES_PER_SECOND = Gauge(
+    "swipe_scan_entities_per_second",
+    "Скорость последнего сканирования, сущностей в секунду",
+)
+PARSE_CACHE_LOOKUPS = Counter(
+    "swipe_parse_cache_lookups_total", "Обращения к кэшу разбора файлов", ["result"]
+)
+SCAN_PEAK_RSS_BYTES = Gauge(
+    "swipe_scan_peak_rss_bytes",
+    "Пиковый RSS основного процесса за последнее сканирование",
+)
+ANALYSIS_CACHE_LOOKUPS = Counter(
+    "swipe_analysis_cache_lookups_total",
+    "Обращения к кэшу анализа сущностей по ast_hash",
+    ["result"],
+)
+# accepted — принят в буфер, replayed — повтор по ключу идемпотентности из памяти,
+# applied — записан в БД, ignored — ключ уже был в журнале свайпов
+SWIPE_ACTIONS = Counter("swipe_swipe_actions_total", "Свайпы карточек", ["result"])
+SWIPE_FLUSH_DURATION = Histogram(
+    "swipe_swipe_flush_duration_seconds",
+    "Длительность записи пачки свайпов в БД",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+class _RuntimeCollector(Collector):
+    """Состояние пулов БД и кэша исходников на момент запроса метрик"""
+
+    def collect(self):
+        pool_size = GaugeMetricFamily(
+            "swipe_db_pool_size", "Размер пула соединений БД", labels=["engine"]
+        )
+        pool_connections = GaugeMetricFamily(
+            "swipe_db_pool_connections",
+            "Соединения пула БД по состоянию",
+            labels=["engine", "state"],
+        )
+        for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+            pool_size.add_metric([name], pool.size())
+            pool_connections.add_metric([name, "checked_out"], pool.checkedout())
+            pool_connections.add_metric([name, "idle"], pool.checkedin())
+            pool_connections.add_metric([name, "overflow"], max(pool.overflow(), 0))
+        yield pool_size
+        yield pool_connections
+
+        stats = source_cache.stats()
+        lookups = CounterMetricFamily(
+            "swipe_source_cache_lookups",
+            "Обращения к кэшу исходников при чтении карточек",
+            labels=["result"],
+        )
+        lookups.add_metric(["hit"], stats["hits"])
+        lookups.add_metric(["miss"], stats["misses"])
+        yield lookups
+        yield GaugeMetricFamily(
+            "swipe_source_cache_entries",
+            "Файлов в кэше исходников",
+            value=stats["entries"],
+        )
+        yield GaugeMetricFamily(
+            "swipe_source_cache_bytes",
+            "Объём кэша исходников в байтах",
+            value=stats["bytes"],
+        )
+
+
+REGISTRY.register(_RuntimeCollector())
+
+
+def render_metrics():
+    """Метрики в текстовом формате Prometheus и их Content-Type.
+
+    При запуске в нескольких процессах gunicorn с PROMETHEUS_MULTIPROC_DIR
+    счётчики и гистограммы собираются по всем процессам, а состояние пулов
+    БД и кэша исходников — процесса, ответившего на запрос.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(_RuntimeCollector())
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность запросов по шаблону маршрута.
+
+    Шаблон (/cards/{card_id}) берётся после маршрутизации, чтобы число
+    серий не росло с числом разных id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            ).observe(time.perf_counter() - started)
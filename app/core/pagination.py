@@ -0,0 +1,63 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlmodel import Session, tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+def encode_cursor(created_at: datetime, item_id: UUID) -> str:
+    """Кодирует позицию (created_at, id) в непрозрачный курсор"""
+    raw = f"{created_at.isoformat()}|{item_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Разбирает курсор; ValueError, если он повреждён"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, item_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(item_id)
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError(f"Некорректный курсор: {cursor}") from exc
+
+
+def _page_query(query, model, limit: int, cursor: Optional[str]):
+    """Добавляет к запросу условие keyset-пагинации, сортировку и лимит"""
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(model.created_at, model.id) > tuple_(created_at, item_id)
+        )
+    return query.order_by(model.created_at, model.id).limit(limit + 1)
+
+
+def _split_page(items: List, limit: int) -> Tuple[List, Optional[str]]:
+    """Отрезает лишнюю запись и строит курсор следующей страницы"""
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
+
+
+def paginate(
+    db: Session, query, model, limit: int, cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """Keyset-пагинация по (created_at, id).
+
+    Следующая страница начинается строго после последней записи текущей,
+    поэтому стоимость запроса не зависит от глубины листания.
+    """
+    query = _page_query(query, model, limit, cursor)
+    return _split_page(db.exec(query).all(), limit)
+
+
+async def paginate_async(
+    db: AsyncSession, query, model, limit: int, cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """То же, что paginate, для асинхронной сессии"""
+    query = _page_query(query, model, limit, cursor)
+    return _split_page((await db.exec(query)).all(), limit)
@@ -0,0 +1,300 @@
+import ast
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import config
+from models.cards import CardSeverity
+
+from .python_parser import iter_python_entity_nodes
+
+# Порядок серьёзности — у карточки остаётся самая серьёзная из находок
+SEVERITY_ORDER = [
+    CardSeverity.low,
+    CardSeverity.medium,
+    CardSeverity.high,
+    CardSeverity.critical,
+]
+
+# Управляющие конструкции, увеличивающие вложенность кода
+_BLOCK_NODES = (
+    ast.If,
+    ast.For,
+    ast.AsyncFor,
+    ast.While,
+    ast.With,
+    ast.AsyncWith,
+    ast.Try,
+    ast.Match,
+)
+# Ветвления для цикломатической сложности (кроме and/or — считаются по операндам)
+_BRANCH_NODES = (
+    ast.If,
+    ast.IfExp,
+    ast.For,
+    ast.AsyncFor,
+    ast.While,
+    ast.ExceptHandler,
+    ast.Assert,
+    ast.comprehension,
+    ast.match_case,
+)
+_DEFINITION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+def _finding(analyzer: str, severity: CardSeverity, message: str) -> Dict:
+    return {"analyzer": analyzer, "severity": severity.value, "message": message}
+
+
+def _over_limit(value: int, limit: int) -> Optional[CardSeverity]:
+    """medium — порог превышен, high — превышен вдвое; None — в пределах порога"""
+    if limit <= 0 or value <= limit:
+        return None
+    return CardSeverity.high if value > 2 * limit else CardSeverity.medium
+
+
+def _walk_body(node: ast.AST) -> List[Tuple[ast.AST, int]]:
+    """Узлы тела сущности с глубиной вложенности, без вложенных функций и классов.
+
+    Вложенные сущности — отдельные карточки со своим анализом.
+    """
+    body = []
+    stack = [(child, 0) for child in reversed(list(ast.iter_child_nodes(node)))]
+    while stack:
+        child, depth = stack.pop()
+        if isinstance(child, _DEFINITION_NODES):
+            continue
+        body.append((child, depth))
+        if isinstance(child, _BLOCK_NODES):
+            depth += 1
+        stack.extend(
+            (item, depth) for item in reversed(list(ast.iter_child_nodes(child)))
+        )
+    return body
+
+
+class Entity:
+    """Сущность для анализаторов: узел AST, вид и общий для всех обход тела"""
+
+    def __init__(self, node: ast.AST, kind: str):
+        self.node = node
+        self.kind = kind
+        self._body: Optional[List[Tuple[ast.AST, int]]] = None
+
+    @property
+    def body(self) -> List[Tuple[ast.AST, int]]:
+        if self._body is None:
+            self._body = _walk_body(self.node)
+        return self._body
+
+
+class Analyzer:
+    """Проверка одной сущности.
+
+    Результат должен зависеть только от структуры кода и параметров
+    анализатора: он кэшируется по ast_hash сущности и версии анализа,
+    в которую входят name, version и params всех анализаторов.
+    """
+
+    name = ""
+    version = 1
+
+    def params(self) -> Tuple:
+        return ()
+
+    def analyze(self, entity: Entity) -> List[Dict]:
+        raise NotImplementedError
+
+
+class SizeAnalyzer(Analyzer):
+    """Слишком большие функции и классы — по числу инструкций, а не строк,
+    чтобы форматирование не влияло на результат. Класс считается вместе
+    с методами, функция — без вложенных функций.
+    """
+
+    name = "size"
+
+    def __init__(self, max_function: int, max_class: int):
+        self.max_function = max_function
+        self.max_class = max_class
+
+    def params(self) -> Tuple:
+        return (self.max_function, self.max_class)
+
+    def analyze(self, entity: Entity) -> List[Dict]:
+        if entity.kind == "class":
+            nodes = ast.walk(entity.node)
+            statements = sum(isinstance(item, ast.stmt) for item in nodes) - 1
+            limit = self.max_class
+        else:
+            statements = sum(isinstance(item, ast.stmt) for item, _ in entity.body)
+            limit = self.max_function
+        severity = _over_limit(statements, limit)
+        if severity is None:
+            return []
+        if entity.kind == "class":
+            what = "Слишком большой класс"
+        else:
+            what = "Слишком большая функция"
+        return [
+            _finding(
+                self.name, severity, f"{what}: {statements} инструкций (порог {limit})"
+            )
+        ]
+
+
+class ComplexityAnalyzer(Analyzer):
+    """Цикломатическая сложность функции: 1 + число ветвлений"""
+
+    name = "complexity"
+
+    def __init__(self, max_complexity: int):
+        self.max_complexity = max_complexity
+
+    def params(self) -> Tuple:
+        return (self.max_complexity,)
+
+    def analyze(self, entity: Entity) -> List[Dict]:
+        if entity.kind != "function":
+            return []
+        complexity = 1
+        for child, _ in entity.body:
+            if isinstance(child, _BRANCH_NODES):
+                complexity += 1
+                if isinstance(child, ast.comprehension):
+                    complexity += len(child.ifs)
+            elif isinstance(child, ast.BoolOp):
+                complexity += len(child.values) - 1
+        severity = _over_limit(complexity, self.max_complexity)
+        if severity is None:
+            return []
+        return [
+            _finding(
+                self.name,
+                severity,
+                f"Высокая цикломатическая сложность: {complexity} "
+                f"(порог {self.max_complexity})",
+            )
+        ]
+
+
+class NestingAnalyzer(Analyzer):
+    """Глубина вложенности управляющих конструкций в теле функции"""
+
+    name = "nesting"
+
+    def __init__(self, max_depth: int):
+        self.max_depth = max_depth
+
+    def params(self) -> Tuple:
+        return (self.max_depth,)
+
+    def analyze(self, entity: Entity) -> List[Dict]:
+        if entity.kind != "function":
+            return []
+        depth = max(
+            (
+                level + 1
+                for child, level in entity.body
+                if isinstance(child, _BLOCK_NODES)
+            ),
+            default=0,
+        )
+        severity = _over_limit(depth, self.max_depth)
+        if severity is None:
+            return []
+        return [
+            _finding(
+                self.name,
+                severity,
+                f"Глубокая вложенность: {depth} уровней (порог {self.max_depth})",
+            )
+        ]
+
+
+# Анализаторы сущностей, которые сканер запускает в процессах-обработчиках.
+# Дубликаты по ast_hash ищет сам сканер после записи карточек — для этого
+# нужны карточки всего репозитория
+ANALYZERS: List[Analyzer] = [
+    SizeAnalyzer(
+        config.ANALYSIS_MAX_FUNCTION_STATEMENTS, config.ANALYSIS_MAX_CLASS_STATEMENTS
+    ),
+    ComplexityAnalyzer(config.ANALYSIS_MAX_COMPLEXITY),
+    NestingAnalyzer(config.ANALYSIS_MAX_NESTING),
+]
+
+DUPLICATE_ANALYZER = "duplicate"
+
+# Версия анализа — ключ кэша результатов и часть версии карточек: при
+# изменении анализаторов или порогов карточки пересчитываются. Порог
+# дублирования тоже входит — находку «дублирование» пересчитывает сканер
+# только у переписанных карточек
+ANALYSIS_VERSION = hashlib.sha1(
+    repr(
+        [(a.name, a.version, a.params()) for a in ANALYZERS]
+        + [(DUPLICATE_ANALYZER, config.ANALYSIS_DUPLICATE_MIN_LINES)]
+    ).encode("utf-8")
+).hexdigest()[:8]
+
+
+def duplicate_finding() -> Dict:
+    return _finding(
+        DUPLICATE_ANALYZER,
+        CardSeverity.medium,
+        "Дублирование: такой же код есть в другом месте репозитория",
+    )
+
+
+def summarize(findings: List[Dict]) -> Tuple[CardSeverity, Optional[str]]:
+    """Серьёзность и текст ошибки карточки по её находкам.
+
+    Без находок карточка не проблемная: low и пустая ошибка.
+    """
+    if not findings:
+        return CardSeverity.low, None
+    ordered = sorted(
+        findings,
+        key=lambda item: SEVERITY_ORDER.index(CardSeverity(item["severity"])),
+        reverse=True,
+    )
+    return CardSeverity(ordered[0]["severity"]), "; ".join(
+        item["message"] for item in ordered
+    )
+
+
+def analyze_python_entities(
+    entities: List[Dict],
+    load_source: Callable[[], str],
+    cache=None,
+    nodes: Optional[List[Tuple[str, ast.AST]]] = None,
+) -> Tuple[int, int]:
+    """Дописывает каждой сущности findings — находки всех анализаторов.
+
+    Результаты берутся из кэша по ast_hash. nodes — пары (kind, узел) от
+    только что разобравшего файл extract_python_module; без них (файл
+    взят из кэша разбора) исходный текст читается и разбирается, только
+    если хотя бы одной сущности нет в кэше анализа.
+    Возвращает число попаданий и промахов кэша.
+    """
+    keys = [ent["ast_hash"].hex() for ent in entities]
+    cached = cache.get_many(keys, ANALYSIS_VERSION) if cache else {}
+    missing = [ent for ent, key in zip(entities, keys) if key not in cached]
+    for ent, key in zip(entities, keys):
+        if key in cached:
+            ent["findings"] = cached[key]
+    if not missing:
+        return len(entities), 0
+
+    if nodes is None:
+        nodes = iter_python_entity_nodes(ast.parse(load_source()))
+    by_position = {(node.lineno, node.name): (node, kind) for kind, node in nodes}
+    computed = {}
+    for ent in missing:
+        entity = Entity(*by_position[(ent["start_line"], ent["simple_name"])])
+        findings = []
+        for analyzer in ANALYZERS:
+            findings.extend(analyzer.analyze(entity))
+        ent["findings"] = findings
+        computed[ent["ast_hash"].hex()] = findings
+    if cache:
+        cache.put_many(computed, ANALYSIS_VERSION)
+    return len(entities) - len(missing), len(missing)
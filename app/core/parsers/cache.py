@@ -0,0 +1,195 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from core.config import config
+
+# Как часто (в записях) проверять суммарный размер кэша
+_EVICT_CHECK_EVERY = 100
+# До какой доли от лимита очищать кэш при переполнении
+_EVICT_TARGET = 0.9
+# Сколько ключей искать одним запросом (лимит параметров SQLite — 999)
+_LOOKUP_BATCH = 500
+
+
+def git_blob_hash(data: bytes) -> str:
+    """Считает SHA-1 содержимого так же, как git считает id blob-объекта"""
+    header = b"blob %d\0" % len(data)
+    return hashlib.sha1(header + data).hexdigest()
+
+
+class ParseCache:
+    """Дисковый кэш результатов разбора файлов (SQLite) с LRU-вытеснением.
+
+    Ключ — хэш blob-объекта файла и версия парсера, значение — результат
+    разбора (сущности и импорты модуля). Одинаковые файлы из разных репозиториев
+    разбираются один раз. В той же таблице хранятся результаты анализа
+    сущностей по ast_hash (get_many/put_many) — у них своя версия в ключе.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Кэш используется и из процессов-обработчиков, поэтому ждём блокировку
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_entries_last_used ON entries (last_used)"
+        )
+
+    @staticmethod
+    def _key(blob_hash: str, version: str) -> str:
+        return f"{version}:{blob_hash}"
+
+    def get(self, blob_hash: str, version: str) -> Optional[Dict]:
+        key = self._key(blob_hash, version)
+        try:
+            row = self._conn.execute(
+                "SELECT data FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        except sqlite3.Error:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, blob_hash: str, version: str, module: Dict):
+        data = pickle.dumps(module, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, data, size, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                (self._key(blob_hash, version), data, len(data), time.time()),
+            )
+            self._puts += 1
+            if self._puts % _EVICT_CHECK_EVERY == 0:
+                self.evict()
+        except sqlite3.Error:
+            pass
+
+    def get_many(self, hashes: List[str], version: str) -> Dict[str, object]:
+        """Найденные значения по хэшам; не входят в hits/misses кэша разбора"""
+        keys = list({self._key(value, version): value for value in hashes}.items())
+        rows = []
+        try:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = [key for key, _ in keys[i : i + _LOOKUP_BATCH]]
+                rows.extend(
+                    self._conn.execute(
+                        "SELECT key, data FROM entries WHERE key IN"
+                        f" ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                )
+            if rows:
+                now = time.time()
+                self._write_many(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, key) for key, _ in rows],
+                )
+        except sqlite3.Error:
+            return {}
+        by_key = dict(keys)
+        return {by_key[key]: pickle.loads(data) for key, data in rows}
+
+    def put_many(self, values: Dict[str, object], version: str):
+        now = time.time()
+        rows = []
+        for value_hash, value in values.items():
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((self._key(value_hash, version), data, len(data), now))
+        try:
+            self._write_many(
+                "INSERT OR REPLACE INTO entries (key, data, size, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            puts, self._puts = self._puts, self._puts + len(rows)
+            if puts // _EVICT_CHECK_EVERY != self._puts // _EVICT_CHECK_EVERY:
+                self.evict()
+        except sqlite3.Error:
+            pass
+
+    def _write_many(self, sql: str, rows: List[tuple]):
+        # Соединение в режиме autocommit — без явной транзакции каждая
+        # строка фиксировалась бы отдельно
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(sql, rows)
+        except sqlite3.Error:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def size(self) -> int:
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return row[0]
+
+    def evict(self):
+        """Удаляет давно не использованные записи, пока кэш больше лимита"""
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * _EVICT_TARGET
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_used")
+        stale = []
+        for key, size in rows:
+            if total <= target:
+                break
+            stale.append((key,))
+            total -= size
+        rows.close()
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        self.evictions += len(stale)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_cache: Optional[ParseCache] = None
+_cache_pid: Optional[int] = None
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Возвращает кэш текущего процесса (соединение SQLite нельзя делить после fork)"""
+    global _cache, _cache_pid
+    if not config.PARSE_CACHE_ENABLED:
+        return None
+    if _cache is None or _cache_pid != os.getpid():
+        _cache = ParseCache(
+            os.path.join(config.TEMP_REPO_PATH, ".parse_cache.sqlite3"),
+            config.PARSE_CACHE_MAX_MB * 1024 * 1024,
+        )
+        _cache_pid = os.getpid()
+    return _cache
@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterator, Tuple
+
+import git
+
+# Режимы git-дерева для обычных файлов (симлинки и сабмодули пропускаем)
+_FILE_MODES = {"100644", "100755"}
+# Сколько открытых репозиториев держать в процессе: у каждого свои
+# процессы git cat-file и файловые дескрипторы
+_MAX_REPOS = 16
+
+_repos: "OrderedDict[str, git.Repo]" = OrderedDict()
+# git cat-file --batch у Repo один на всех — чтения из потоков сериализуем
+_lock = threading.RLock()
+
+
+def _restart_after_fork():
+    # Процессы-обработчики сканера создаются fork-ом, возможно в момент,
+    # когда блокировку держит поток чтения карточки, — в дочернем процессе
+    # начинаем с новой блокировки. Процессы git принадлежат родителю:
+    # их Repo не закрываем, а просто забываем
+    global _lock, _repos
+    _lock = threading.RLock()
+    _repos = OrderedDict()
+
+
+def get_git_repo(repo_path: str) -> git.Repo:
+    """Возвращает git.Repo текущего процесса.
+
+    Объекты читаются через долгоживущий `git cat-file --batch`, поэтому
+    Repo переиспользуется, но не передаётся между процессами. Давно не
+    использованные репозитории закрываются.
+    """
+    key = os.path.abspath(repo_path)
+    with _lock:
+        repo = _repos.get(key)
+        if repo is not None:
+            _repos.move_to_end(key)
+            return repo
+        repo = git.Repo(repo_path, odbt=git.GitCmdObjectDB)
+        _repos[key] = repo
+        while len(_repos) > _MAX_REPOS:
+            _repos.popitem(last=False)[1].close()
+        return repo
+
+
+def forget_git_repo(repo_path: str):
+    """Закрывает Repo репозитория — перед повторным клонированием или
+    обновлением, чтобы не читать объекты через устаревший cat-file
+    """
+    with _lock:
+        repo = _repos.pop(os.path.abspath(repo_path), None)
+        if repo is not None:
+            repo.close()
+
+
+def resolve_commit(repo_path: str, rev: str) -> str:
+    """Возвращает SHA коммита для ветки/тега/SHA; ValueError, если его нет"""
+    try:
+        with _lock:
+            return get_git_repo(repo_path).commit(rev).hexsha
+    except (git.BadName, git.GitCommandError, ValueError) as exc:
+        raise ValueError(f"Коммит не найден: {rev}") from exc
+
+
+def iter_commit_blobs(repo_path: str, rev: str) -> Iterator[Tuple[str, str]]:
+    """Перебирает файлы дерева коммита как (путь, SHA blob-объекта)"""
+    output = get_git_repo(repo_path).git.ls_tree("-r", "-z", "--full-tree", rev)
+    for record in output.split("\0"):
+        if not record:
+            continue
+        meta, path = record.split("\t", 1)
+        mode, obj_type, sha = meta.split(" ")
+        if obj_type == "blob" and mode in _FILE_MODES:
+            yield path, sha
+
+
+def resolve_blob(repo_path: str, rev: str, path: str) -> str:
+    """Возвращает SHA blob-объекта файла в указанном коммите"""
+    try:
+        with _lock:
+            return (get_git_repo(repo_path).commit(rev).tree / path).hexsha
+    except KeyError as exc:
+        raise ValueError(f"Файл {path} отсутствует в {rev}") from exc
+    except (git.BadName, git.GitCommandError, ValueError) as exc:
+        raise ValueError(f"Коммит не найден: {rev}") from exc
+
+
+def read_blob(repo_path: str, blob_sha: str) -> bytes:
+    """Читает содержимое blob-объекта без рабочего дерева"""
+    try:
+        with _lock:
+            stream = get_git_repo(repo_path).odb.stream(bytes.fromhex(blob_sha))
+            return stream.read()
+    except (git.BadObject, ValueError) as exc:
+        raise ValueError(f"Объект {blob_sha} не найден") from exc
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,234 @@
+import posixpath
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def module_name(rel_path: str) -> str:
+    """Имя модуля по пути от корня репозитория: a/b/c.py → a.b.c, a/__init__.py → a"""
+    parts = rel_path[: -len(".py")].split("/")
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def absolute_module(module: str, level: int, importer: str) -> Optional[str]:
+    """Абсолютное имя модуля для from-импорта уровня level из файла importer"""
+    if not level:
+        return module
+    package = module_name(importer).split(".") if importer else []
+    if not importer.endswith("/__init__.py") and importer != "__init__.py":
+        package = package[:-1]
+    if level - 1 > len(package):
+        return None
+    package = package[: len(package) - (level - 1)]
+    return ".".join(package + ([module] if module else []))
+
+
+class ModuleIndex:
+    """Модули репозитория с поиском по имени относительно корня исходников.
+
+    Корень исходников заранее неизвестен (код может лежать в app/ или
+    src/), поэтому модуль app/core/config.py находится и как
+    app.core.config, и как core.config — если импортирующий файл лежит
+    внутри app/. При нескольких подходящих корнях выбирается ближайший.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self._by_suffix: Dict[str, List[Tuple[str, str]]] = {}
+        for path in paths:
+            parts = module_name(path).split(".")
+            for i in range(len(parts)):
+                suffix = ".".join(parts[i:])
+                root = "/".join(parts[:i])
+                self._by_suffix.setdefault(suffix, []).append((root, path))
+
+    def resolve(self, module: str, importer: str) -> Optional[str]:
+        """Файл модуля module для импорта из файла importer или None"""
+        importer_dir = posixpath.dirname(importer)
+        best = None
+        for root, path in self._by_suffix.get(module, ()):
+            if (
+                root
+                and importer_dir != root
+                and not importer_dir.startswith(root + "/")
+            ):
+                continue
+            if best is None or len(root) > len(best[0]):
+                best = (root, path)
+        return best[1] if best else None
+
+
+def _bindings(imports: List[Dict], importer: str) -> Dict[str, str]:
+    """Локальное имя → полное точечное имя, к которому оно привязано импортом"""
+    bindings = {}
+    for item in imports:
+        if item["name"] is None:
+            module = item["module"]
+            if item["alias"]:
+                bindings[item["alias"]] = module
+            else:
+                # import a.b.c привязывает только a
+                root = module.split(".")[0]
+                bindings[root] = root
+            continue
+        if item["name"] == "*":
+            continue
+        module = absolute_module(item["module"], item["level"], importer)
+        if module is None:
+            continue
+        target = f"{module}.{item['name']}" if module else item["name"]
+        bindings[item["alias"] or item["name"]] = target
+    return bindings
+
+
+def _name_candidates(parts: List[str], start: int = 0) -> List[str]:
+    """Префиксы имени a.b.c; методы сканер называет Class.<locals>.method,
+    поэтому для вложенных частей есть и такой вариант. Самое длинное имя,
+    которое окажется сущностью, выбирается при запросе.
+    """
+    candidates = []
+    for i in range(start, len(parts)):
+        candidates.append(".".join(parts[: i + 1]))
+        if i:
+            candidates.append(".".join(parts[:i] + ["<locals>", parts[i]]))
+    return candidates
+
+
+def _resolve_dotted(
+    dotted: str, importer: str, index: ModuleIndex
+) -> Optional[Tuple[str, List[str]]]:
+    """Файл и части имени внутри него для полного точечного имени a.b.func"""
+    parts = dotted.split(".")
+    for i in range(len(parts), 0, -1):
+        path = index.resolve(".".join(parts[:i]), importer)
+        if path is not None:
+            return path, parts[i:]
+    return None
+
+
+def import_rows(imports: List[Dict], importer: str, index: ModuleIndex) -> List[Dict]:
+    """Импорты файла с абсолютным именем модуля и файлом, где он определён"""
+    rows = []
+    for item in imports:
+        module = absolute_module(item["module"], item["level"], importer)
+        target_file = None
+        is_module = item["name"] is None
+        if module is not None:
+            target_file = index.resolve(module, importer)
+            # from pkg import module — импортирован модуль, а не имя из pkg
+            if item["name"] and item["name"] != "*":
+                submodule = f"{module}.{item['name']}" if module else item["name"]
+                submodule_file = index.resolve(submodule, importer)
+                if submodule_file is not None:
+                    target_file, is_module = submodule_file, True
+        rows.append(
+            {
+                "file_path": importer,
+                "line": item["line"],
+                "module": module if module is not None else item["module"],
+                "name": item["name"],
+                "alias": item["alias"],
+                "is_local": item["local"],
+                "is_module": is_module,
+                "target_file": target_file,
+            }
+        )
+    return rows
+
+
+def reference_rows(
+    importer: str,
+    imports: List[Dict],
+    entities: List[Tuple[str, str, List[str]]],
+    index: ModuleIndex,
+) -> List[Dict]:
+    """Возможные цели ссылок сущностей файла: (target_file, target_name).
+
+    entities — тройки (full_name, kind, refs). Для ссылки a.b.c сохраняются все
+    префиксы имени внутри целевого файла; какие из них действительно
+    сущности, решает соединение с карточками при запросе зависимостей.
+    Имена без импорта и без сущности в этом же файле (локальные
+    переменные, встроенные функции) отбрасываются.
+    """
+    bindings = _bindings(imports, importer)
+    top_names = {full_name.split(".")[0] for full_name, _, _ in entities}
+    classes = {full_name for full_name, kind, _ in entities if kind == "class"}
+
+    rows = []
+    for full_name, _, refs in entities:
+        # self.x / cls.x внутри метода (Class.<locals>.method) — атрибут класса
+        owner = full_name.rpartition(".")[0]
+        if owner.endswith(".<locals>") and owner[: -len(".<locals>")] in classes:
+            owner = owner[: -len(".<locals>")]
+        else:
+            owner = ""
+        seen = set()
+        for ref in refs:
+            root, _, rest = ref.partition(".")
+            rest_parts = rest.split(".") if rest else []
+            start = 0
+            if root in bindings:
+                resolved = _resolve_dotted(
+                    ".".join([bindings[root], *rest_parts]), importer, index
+                )
+                if resolved is None or not resolved[1]:
+                    continue
+                target_file, name_parts = resolved
+            elif root in ("self", "cls") and owner and rest_parts:
+                target_file, name_parts = importer, [owner, rest_parts[0]]
+                start = 1
+            elif root in top_names:
+                target_file, name_parts = importer, [root, *rest_parts]
+            else:
+                continue
+            for target_name in _name_candidates(name_parts, start):
+                key = (target_file, target_name)
+                if key in seen or key == (importer, full_name):
+                    continue
+                seen.add(key)
+                rows.append(
+                    {
+                        "file_path": importer,
+                        "full_name": full_name,
+                        "name": ref,
+                        "target_file": target_file,
+                        "target_name": target_name,
+                    }
+                )
+    return rows
+
+
+def name_targets(name: str, importer: str, imports: Iterable) -> List[Tuple[str, str]]:
+    """Возможные сущности (file_path, full_name) для имени из файла importer.
+
+    imports — сохранённые сканером импорты файла (FileImport): модуль в них
+    уже абсолютный и разрешён в файл. Имя, не привязанное импортом, ищется
+    среди сущностей самого файла. Кандидаты идут от самого точного.
+    """
+    parts = name.split(".")
+    targets = []
+    for item in imports:
+        if item.target_file is None:
+            continue
+        if item.name is None:
+            # import a.b as m → m.func; import a.b → a.b.func
+            module_parts = item.module.split(".")
+            size = 1 if item.alias else len(module_parts)
+            bound = [item.alias] if item.alias else module_parts
+            if parts[:size] != bound:
+                continue
+            rest = parts[size:]
+        else:
+            if parts[0] != (item.alias or item.name):
+                continue
+            # from pkg import module — имя внутри модуля, а не внутри pkg
+            if item.is_module:
+                rest = parts[1:]
+            else:
+                rest = [item.name, *parts[1:]]
+        if rest:
+            targets.extend(
+                (item.target_file, target)
+                for target in reversed(_name_candidates(rest))
+            )
+    targets.extend((importer, target) for target in reversed(_name_candidates(parts)))
+    return targets
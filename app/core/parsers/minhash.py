@@ -0,0 +1,85 @@
+import hashlib
+import random
+import struct
+from typing import List, Optional, Tuple
+
+# Число хэш-функций в сигнатуре и разбиение её на LSH-корзины:
+# при 16 корзинах по 4 значения пары с похожестью от ~0.5 почти всегда
+# попадают хотя бы в одну общую корзину
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# Длина шингла в токенах нормализованного AST
+SHINGLE_SIZE = 5
+
+_MAX_HASH = (1 << 32) - 1
+
+# Хэш-функции сигнатуры — XOR 64-битного хэша шингла со случайной маской:
+# min(map(mask.__xor__, ...)) считается циклом на C, в разы быстрее
+# линейных перестановок (a * x + b) mod p. Маски зафиксированы сидом,
+# чтобы сигнатуры совпадали между процессами и сканированиями
+_rng = random.Random(20240601)
+_MASKS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+
+_SIGNATURE_FORMAT = f"<{NUM_PERM}I"
+
+
+def shingle_hashes(tokens: List[str]) -> List[int]:
+    """Хэши шинглов по позициям: i-й — для токенов tokens[i : i + SHINGLE_SIZE]"""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                " ".join(tokens[i : i + SHINGLE_SIZE]).encode("utf-8"), digest_size=8
+            ).digest(),
+            "little",
+        )
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    ]
+
+
+def minhash_values(hashes: List[int]) -> Optional[List[int]]:
+    """Минимумы по каждой хэш-функции; None для пустого набора шинглов.
+
+    Для объединения наборов значения берутся поэлементным минимумом,
+    поэтому сигнатуру родителя можно собрать из сигнатур вложенных сущностей.
+    """
+    if not hashes:
+        return None
+    return [min(map(mask.__xor__, hashes)) for mask in _MASKS]
+
+
+def merge_minhash(*values: Optional[List[int]]) -> Optional[List[int]]:
+    """Значения MinHash для объединения наборов шинглов"""
+    present = [v for v in values if v is not None]
+    if not present:
+        return None
+    return list(map(min, *present)) if len(present) > 1 else present[0]
+
+
+def pack_signature(values: List[int]) -> Tuple[bytes, List[int]]:
+    """Упаковывает значения MinHash в сигнатуру и считает ключи LSH-корзин"""
+    signature = struct.pack(_SIGNATURE_FORMAT, *(v & _MAX_HASH for v in values))
+    band_size = LSH_ROWS * 4
+    bands = [
+        # Номер корзины входит в ключ, чтобы одинаковые значения
+        # в разных корзинах не считались совпадением
+        int.from_bytes(
+            hashlib.blake2b(
+                bytes([band]) + signature[band * band_size : (band + 1) * band_size],
+                digest_size=8,
+            ).digest(),
+            "little",
+            signed=True,
+        )
+        for band in range(LSH_BANDS)
+    ]
+    return signature, bands
+
+
+def minhash_similarity(left: bytes, right: bytes) -> float:
+    """Оценка коэффициента Жаккара по двум сигнатурам"""
+    left_values = struct.unpack(_SIGNATURE_FORMAT, left)
+    right_values = struct.unpack(_SIGNATURE_FORMAT, right)
+    same = sum(1 for a, b in zip(left_values, right_values) if a == b)
+    return same / NUM_PERM
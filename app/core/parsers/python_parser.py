@@ -1,6 +1,44 @@
 import ast
 import hashlib
-from typing import Dict, List, Optional, Tuple
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .minhash import (
+    SHINGLE_SIZE,
+    merge_minhash,
+    minhash_values,
+    pack_signature,
+    shingle_hashes,
+)
+
+# Версия формата извлекаемых сущностей — меняется вместе с логикой разбора,
+# чтобы записи в кэше разбора от старой версии не использовались
+PARSER_VERSION = 6
+
+# Концы строк так, как их видит токенизатор Python
+_NEWLINE_RE = re.compile(rb"\r\n|\r|\n")
+
+_ENTITY_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# Поля, не влияющие на структуру кода: Load/Store, префикс u"" и type comments
+_IGNORED_FIELDS = {"ctx", "kind", "type_comment"}
+
+# Сколько частей точечного имени ссылки хранить (a.b.c.d)
+_MAX_REF_PARTS = 4
+
+# Предел длины аннотации, значения по умолчанию и строки документации в
+# сигнатуре — подсказке хватает начала, длинные выражения обрезаются
+_MAX_SIGNATURE_TEXT = 120
+
+# Узлы, из которых собираются импорты, ссылки и локальные имена
+_COLLECTED_NODES = (
+    ast.Name,
+    ast.Attribute,
+    ast.Import,
+    ast.ImportFrom,
+    ast.arg,
+    ast.ExceptHandler,
+)
 
 
 def normalize_python_ast(node: ast.AST) -> str:
@@ -30,6 +68,184 @@ def normalize_python_ast(node: ast.AST) -> str:
     return ast.unparse(normalized)
 
 
+def _normalize_value(node: ast.AST, field: str, value) -> Optional[str]:
+    """Обобщённый токен для значения поля узла (как в normalize_python_ast).
+
+    None — поле не задано (например, returns у функции без аннотации).
+    """
+    if isinstance(node, ast.Constant):
+        if isinstance(value, str):
+            return "__str__"
+        if isinstance(value, (int, float)):
+            return "__num__"
+        if value is None:
+            return "__none__"
+        return repr(value)
+    if value is None:
+        return None
+    if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Load, ast.Store)):
+        return "__var__"
+    return str(value)
+
+
+def _dotted_name(node: ast.AST) -> Optional[Tuple[str, List[ast.AST]]]:
+    """Точечное имя цепочки a.b.c и её узлы; None, если в корне не имя"""
+    parts = []
+    nodes = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        nodes.append(node)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    nodes.append(node)
+    parts.reverse()
+    return ".".join(parts[:_MAX_REF_PARTS]), nodes
+
+
+class _StructureHasher:
+    """Один проход по AST модуля: Merkle-хэши узлов и поток токенов.
+
+    Хэш узла считается из его типа, обобщённых значений полей и хэшей
+    дочерних узлов, поэтому хэши всех вложенных сущностей получаются
+    за один обход без ast.unparse. Токены пишутся в порядке обхода, и
+    токены любой сущности — непрерывный отрезок [start, end) общего потока.
+
+    В том же обходе собираются импорты модуля и имена, на которые
+    ссылается каждая сущность (вместе с вложенными).
+    """
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        # id(узел сущности) → (хэш, начало, конец отрезка токенов)
+        self.entities: Dict[int, Tuple[bytes, int, int]] = {}
+        # id(узел сущности) → точечные имена, прочитанные в её теле
+        self.refs: Dict[int, List[str]] = {}
+        self.imports: List[Dict] = []
+        # Для каждой открытой сущности: прочитанные имена и связанные в ней
+        # (параметры, присваивания) — последние отбрасываются как локальные
+        self._scopes: List[set] = []
+        self._bound: List[set] = []
+        # Узлы цепочки a.b.c, уже учтённой целиком
+        self._consumed: set = set()
+
+    def _collect(self, node: ast.AST):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                self.imports.append(
+                    {
+                        "module": (
+                            alias.name
+                            if isinstance(node, ast.Import)
+                            else node.module or ""
+                        ),
+                        "level": getattr(node, "level", 0),
+                        "name": None if isinstance(node, ast.Import) else alias.name,
+                        "alias": alias.asname,
+                        "line": node.lineno,
+                        "local": bool(self._scopes),
+                    }
+                )
+            return
+        if not self._scopes:
+            return
+        if isinstance(node, ast.arg):
+            # self/cls оставляем: self.method разрешается в метод класса
+            if node.arg not in ("self", "cls"):
+                self._bound[-1].add(node.arg)
+            return
+        if isinstance(node, ast.ExceptHandler):
+            if node.name:
+                self._bound[-1].add(node.name)
+            return
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            self._bound[-1].add(node.id)
+            return
+        if id(node) in self._consumed or not isinstance(node.ctx, ast.Load):
+            return
+        dotted = _dotted_name(node)
+        if dotted is not None:
+            name, nodes = dotted
+            self._scopes[-1].add(name)
+            self._consumed.update(id(part) for part in nodes)
+
+    def visit(self, node: ast.AST) -> bytes:
+        start = len(self.tokens)
+        is_entity = isinstance(node, _ENTITY_NODES)
+        if is_entity:
+            self._scopes.append(set())
+            self._bound.append(set())
+        elif isinstance(node, _COLLECTED_NODES):
+            self._collect(node)
+        node_type = type(node).__name__
+        self.tokens.append(node_type)
+        digest = hashlib.sha256(node_type.encode("utf-8"))
+        for field, value in ast.iter_fields(node):
+            if field in _IGNORED_FIELDS:
+                continue
+            digest.update(b"\0" + field.encode("utf-8") + b"=")
+            values = value if isinstance(value, list) else [value]
+            if isinstance(value, list):
+                digest.update(b"[%d]" % len(value))
+            for item in values:
+                if isinstance(item, ast.AST):
+                    digest.update(self.visit(item))
+                    continue
+                token = _normalize_value(node, field, item)
+                if token is None:
+                    digest.update(b"\1")
+                    continue
+                self.tokens.append(token)
+                digest.update(token.encode("utf-8") + b"\0")
+
+        node_hash = digest.digest()
+        if is_entity:
+            self.entities[id(node)] = (node_hash, start, len(self.tokens))
+            bound = self._bound.pop()
+            refs = {ref for ref in self._scopes.pop() if ref.split(".")[0] not in bound}
+            self.refs[id(node)] = sorted(refs)
+            if self._scopes:
+                self._scopes[-1] |= refs
+        return node_hash
+
+
+def _entity_minhashes(
+    ranges: List[Tuple[int, int]], shingles: List[int]
+) -> List[Optional[List[int]]]:
+    """Значения MinHash для сущностей по их отрезкам токенов (в порядке обхода).
+
+    Каждый шингл обрабатывается один раз: сущность считает минимумы только
+    по своим шинглам вне вложенных сущностей и объединяет их с уже
+    посчитанными значениями детей.
+    """
+    children: List[List[int]] = [[] for _ in ranges]
+    stack: List[int] = []
+    for i, (start, end) in enumerate(ranges):
+        while stack and ranges[stack[-1]][1] <= start:
+            stack.pop()
+        if stack:
+            children[stack[-1]].append(i)
+        stack.append(i)
+
+    values: List[Optional[List[int]]] = [None] * len(ranges)
+    for i in reversed(range(len(ranges))):
+        start, end = ranges[i]
+        own: List[int] = []
+        cursor = start
+        for child in children[i]:
+            child_start, child_end = ranges[child]
+            own.extend(shingles[cursor:child_start])
+            # Шинглы, начинающиеся у конца вложенной сущности и выходящие
+            # за неё, принадлежат только родителю
+            cursor = max(child_start, child_end - SHINGLE_SIZE + 1)
+        own.extend(shingles[cursor : max(cursor, end - SHINGLE_SIZE + 1)])
+        values[i] = merge_minhash(
+            minhash_values(own), *(values[child] for child in children[i])
+        )
+    return values
+
+
 def _iter_python_entities(tree: ast.AST):
     """Итератор по сущностям Python (классы/функции) с полными именами"""
 
@@ -68,86 +284,218 @@ def _iter_python_entities(tree: ast.AST):
     yield from walk(tree, [])
 
 
-def _split_full_name(full_name: str) -> Tuple[str, int]:
-    """Разделяет имя сущности и индекс при наличии суффикса #N"""
-    if "#" in full_name:
-        base, suffix = full_name.rsplit("#", 1)
-        if suffix.isdigit():
-            return base, int(suffix)
-    return full_name, 1
+def _signature_text(node: Optional[ast.AST]) -> Optional[str]:
+    if node is None:
+        return None
+    text = ast.unparse(node)
+    if len(text) > _MAX_SIGNATURE_TEXT:
+        text = text[: _MAX_SIGNATURE_TEXT - 1] + "…"
+    return text
+
+
+def _first_doc_line(node: ast.AST) -> Optional[str]:
+    doc = ast.get_docstring(node)
+    if not doc:
+        return None
+    line = doc.strip().splitlines()[0].strip()
+    if len(line) > _MAX_SIGNATURE_TEXT:
+        line = line[: _MAX_SIGNATURE_TEXT - 1] + "…"
+    return line
+
+
+def _parameters(args: ast.arguments) -> List[Dict]:
+    """Параметры функции в порядке объявления с видом, аннотацией и значением по умолчанию"""
+    positional = args.posonlyargs + args.args
+    # Значения по умолчанию относятся к последним позиционным параметрам
+    defaults = [None] * (len(positional) - len(args.defaults)) + args.defaults
+    params = []
+
+    def add(arg: ast.arg, kind: str, default: Optional[ast.AST] = None):
+        params.append(
+            {
+                "name": arg.arg,
+                "kind": kind,
+                "annotation": _signature_text(arg.annotation),
+                "default": _signature_text(default),
+            }
+        )
+
+    for i, (arg, default) in enumerate(zip(positional, defaults)):
+        add(
+            arg,
+            "positional_only" if i < len(args.posonlyargs) else "positional",
+            default,
+        )
+    if args.vararg:
+        add(args.vararg, "var_positional")
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        add(arg, "keyword_only", default)
+    if args.kwarg:
+        add(args.kwarg, "var_keyword")
+    return params
+
+
+def python_signature(node: ast.AST) -> Dict:
+    """Компактная сигнатура функции или класса для всплывающей подсказки.
+
+    Для класса параметры берутся из __init__, объявленного в его теле,
+    без self.
+    """
+    doc = _first_doc_line(node)
+    if isinstance(node, ast.ClassDef):
+        params = []
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                item.name == "__init__"
+            ):
+                params = _parameters(item.args)[1:]
+                doc = doc or _first_doc_line(item)
+        return {
+            "bases": [_signature_text(base) for base in node.bases],
+            "params": params,
+            "returns": None,
+            "doc": doc,
+            "is_async": False,
+        }
+    return {
+        "bases": [],
+        "params": _parameters(node.args),
+        "returns": _signature_text(node.returns),
+        "doc": doc,
+        "is_async": isinstance(node, ast.AsyncFunctionDef),
+    }
+
+
+def iter_python_entity_nodes(tree: ast.AST) -> Iterator[Tuple[str, ast.AST]]:
+    """Пары (kind, узел) всех сущностей модуля в порядке обхода"""
+    for entity in _iter_python_entities(tree):
+        yield entity["kind"], entity["node"]
+
+
+def _line_offsets(data: bytes) -> List[int]:
+    """Возвращает байтовые смещения начала каждой строки"""
+    return [0] + [m.end() for m in _NEWLINE_RE.finditer(data)]
 
 
 def extract_python_entities(file_path: str) -> List[Dict]:
     """Извлекает сущности из файла и возвращает их метаданные с хэшом AST"""
     with open(file_path, "r", encoding="utf-8") as f:
         source = f.read()
+    return extract_python_entities_from_source(source)
+
+
+def extract_python_entities_from_source(source: str) -> List[Dict]:
+    """Извлекает сущности из исходного текста модуля"""
+    return extract_python_module(source)["entities"]
+
+
+def extract_python_module(source: str) -> Dict:
+    """Разбирает модуль: сущности с хэшами, ссылками и сигнатурами и импорты модуля.
+
+    Импорты — как записаны в коде (module, level, name, alias); в файлы
+    репозитория их разрешает сканер, когда известен путь к файлу.
+    nodes — пары (kind, узел) сущностей для анализаторов, чтобы не
+    разбирать исходник повторно; в кэш разбора они не попадают.
+    """
     try:
         tree = ast.parse(source)
     except SyntaxError:
-        return []
+        return {"entities": [], "imports": [], "nodes": []}
+
+    # col_offset в AST — смещение в байтах UTF-8 внутри строки
+    line_offsets = _line_offsets(source.encode("utf-8"))
+
+    hasher = _StructureHasher()
+    hasher.visit(tree)
+    found = list(_iter_python_entities(tree))
+    hashed = [hasher.entities[id(entity["node"])] for entity in found]
+    minhashes = _entity_minhashes(
+        [(start, end) for _, start, end in hashed], shingle_hashes(hasher.tokens)
+    )
 
     entities = []
-    for entity in _iter_python_entities(tree):
-        normalized = normalize_python_ast(entity["node"])
-        ast_hash = hashlib.sha256(normalized.encode("utf-8")).digest()
+    for entity, (ast_hash, _, _), values in zip(found, hashed, minhashes):
+        node = entity["node"]
+        packed = pack_signature(values) if values else None
         entities.append(
             {
                 "kind": entity["kind"],
                 "full_name": entity["full_name"],
                 "simple_name": entity["simple_name"],
                 "ast_hash": ast_hash,
+                "minhash": packed[0] if packed else None,
+                "lsh_bands": packed[1] if packed else None,
+                "start_line": node.lineno,
+                "end_line": node.end_lineno,
+                "start_byte": line_offsets[node.lineno - 1] + node.col_offset,
+                "end_byte": line_offsets[node.end_lineno - 1] + node.end_col_offset,
+                "refs": hasher.refs[id(node)],
+                "signature": python_signature(node),
             }
         )
-    return entities
+    return {
+        "entities": entities,
+        "imports": hasher.imports,
+        "nodes": [(entity["kind"], entity["node"]) for entity in found],
+    }
+
+
+def index_python_entities(source: str) -> Dict[str, Tuple[str, int, int, int, int]]:
+    """Строит индекс full_name#N → (kind, start_line, end_line, start_byte, end_byte).
+
+    Суффиксы #N совпадают с теми, что сканер присваивает карточкам.
+    """
+    tree = ast.parse(source)
+    line_offsets = _line_offsets(source.encode("utf-8"))
+
+    index = {}
+    seen_names: Dict[str, int] = {}
+    for entity in _iter_python_entities(tree):
+        node = entity["node"]
+        name = entity["full_name"]
+        seen_names[name] = seen_names.get(name, 0) + 1
+        if seen_names[name] > 1:
+            name = f"{name}#{seen_names[name]}"
+        index[name] = (
+            entity["kind"],
+            node.lineno,
+            node.end_lineno,
+            line_offsets[node.lineno - 1] + node.col_offset,
+            line_offsets[node.end_lineno - 1] + node.end_col_offset,
+        )
+    return index
 
 
 def find_python_entity_block(
-    file_path: str, kind: Optional[str], full_name: str
+    file_path: str, kind: Optional[str], full_name: str, cache=None
 ) -> Dict:
     """Находит блок кода сущности по имени/типу и возвращает его диапазон и текст"""
-    with open(file_path, "r", encoding="utf-8") as f:
-        source = f.read()
     try:
-        tree = ast.parse(source)
+        if cache is not None:
+            entry = cache.get(file_path)
+            data, index = entry.data, entry.index
+        else:
+            with open(file_path, "rb") as f:
+                data = f.read()
+            index = index_python_entities(data.decode("utf-8"))
     except SyntaxError as exc:
         raise ValueError(f"Syntax error in file: {file_path}") from exc
+    return entity_block_from_index(data, index, kind, full_name)
 
-    target_name, target_index = _split_full_name(full_name)
-    seen = 0
-    target_node = None
-    target_kind = None
 
-    for entity in _iter_python_entities(tree):
-        if entity["full_name"] != target_name:
-            continue
-        if kind and entity["kind"] != kind:
-            continue
-        seen += 1
-        if seen == target_index:
-            target_node = entity["node"]
-            target_kind = entity["kind"]
-            break
-
-    if not target_node:
+def entity_block_from_index(
+    data: bytes, index: Dict[str, Tuple], kind: Optional[str], full_name: str
+) -> Dict:
+    """Вырезает блок сущности из содержимого файла по индексу сущностей"""
+    block = index.get(full_name)
+    if block is None or (kind and block[0] != kind):
         raise ValueError(f"Entity not found: {full_name}")
 
-    start_line = getattr(target_node, "lineno", None)
-    end_line = getattr(target_node, "end_lineno", None)
-    code = ast.get_source_segment(source, target_node)
-
-    if code is None and start_line is not None:
-        lines = source.splitlines()
-        if end_line is None:
-            end_line = start_line
-        code = "\n".join(lines[start_line - 1 : end_line])
-
-    if code is None or start_line is None:
-        raise ValueError(f"Unable to extract code for: {full_name}")
-
+    target_kind, start_line, end_line, start_byte, end_byte = block
     return {
         "kind": target_kind,
         "full_name": full_name,
         "start_line": start_line,
-        "end_line": end_line or start_line,
-        "code": code,
+        "end_line": end_line,
+        "code": data[start_byte:end_byte].decode("utf-8"),
     }
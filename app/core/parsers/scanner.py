@@ -1,60 +1,147 @@
 import os
+import pickle
+import resource
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
-from uuid import UUID
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from uuid import UUID, uuid4
 
+import git
 from fastapi import Depends
-from sqlmodel import Session, col, select
+from sqlalchemy import String, any_, bindparam, delete, exists, func, or_
+from sqlalchemy.dialects.postgresql import ARRAY, BYTEA, UUID as PG_UUID, insert
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, col, select, update
 from typing import Set, Tuple
 
 from core.config import config
-from db.session import get_db
-from models.cards import Card, CardSeverity, CardStatus
+from core.metrics import (
+    ANALYSIS_CACHE_LOOKUPS,
+    PARSE_CACHE_LOOKUPS,
+    SCAN_ENTITIES,
+    SCAN_ENTITIES_PER_SECOND,
+    SCAN_FILES,
+    SCAN_FILES_PER_SECOND,
+    SCAN_PEAK_RSS_BYTES,
+    SCAN_STAGE_DURATION,
+)
+from core.utils.logger import setup as setup_logger
+from db.session import engine, get_db
+from models.cards import Card, CardStatus
+from models.dependencies import CardReference, FileImport
 from models.repositories import Repository
-from .python_parser import extract_python_entities, find_python_entity_block
+from .analyzers import (
+    ANALYSIS_VERSION,
+    DUPLICATE_ANALYZER,
+    analyze_python_entities,
+    duplicate_finding,
+    summarize,
+)
+from .cache import get_parse_cache, git_blob_hash
+from .git_source import iter_commit_blobs, read_blob, resolve_blob, resolve_commit
+from .imports import ModuleIndex, import_rows, reference_rows
+from .python_parser import (
+    PARSER_VERSION as PYTHON_PARSER_VERSION,
+    entity_block_from_index,
+    extract_python_module,
+)
+from .source_cache import SourceEntry, source_cache
 
-# Поддерживаемые расширения
+logger = setup_logger(
+    name="SCANNER",
+    log_path=config.LOG_PATH,
+    DEBUG=config.LOG_DEBUG,
+)
+
+# Поддерживаемые расширения: разбор исходного текста в сущности и импорты
 EXTENSIONS = {
-    ".py": extract_python_entities,
+    ".py": extract_python_module,
 }
 
+# Анализ сущностей после разбора: находки по размеру, сложности и т.п.
+ANALYSIS = {
+    ".py": analyze_python_entities,
+}
 
-def get_code(db: Session, card_id: UUID):
-    # Шаг 1: Получаем карточку по ID
-    card = db.get(Card, card_id)
-    if not card:
-        raise ValueError(f"Карточка с id={card_id} не найдена")
+# Версии парсеров — входят в ключ кэша разбора
+PARSER_VERSIONS = {
+    ".py": f"py{PYTHON_PARSER_VERSION}",
+}
 
-    # Шаг 2: Получаем репозиторий
-    repo = db.exec(
-        select(Repository).where(Repository.id == card.repository_id)
-    ).first()
-    if not repo:
-        raise ValueError(f"Репозиторий с id={card.repository_id} не найден")
+# Версии карточек (hash_version): парсер и анализ — при смене любой из них
+# карточки пересчитываются полным сканированием
+CARD_VERSIONS = {
+    ext: f"{version}.{ANALYSIS_VERSION}" for ext, version in PARSER_VERSIONS.items()
+}
+
+# Только папки и точные имена файлов для пропуска при os.walk
+IGNORE_NAMES = {
+    "__pycache__",
+    ".git",
+    ".venv",
+    "venv",
+    "env",
+    "node_modules",
+    ".mypy_cache",
+    ".pytest_cache",
+    "build",
+    "dist",
+    ".tox",
+    "Thumbs.db",
+    ".DS_Store",
+}
+
+
+def _load_card_source(repo: Repository, card: Card, rev: Optional[str] = None):
+    """Возвращает содержимое файла карточки из рабочего дерева или из git.
 
-    # Шаг 3: Формируем путь к файлу
+    С rev файл берётся из дерева указанного коммита. Без rev — из рабочего
+    дерева, а если его нет (например, bare-репозиторий), то из blob-объекта,
+    который был просканирован.
+    """
     repo_root = os.path.abspath(
         os.path.join(config.TEMP_REPO_PATH, repo.repo_full_name)
     )
+    if Path(card.file_path).suffix.lower() != ".py":
+        raise ValueError("Поддерживаются только .py файлы")
+
+    if rev:
+        return source_cache.get_blob(
+            repo_root, resolve_blob(repo_root, rev, card.file_path)
+        )
+
     requested_path = os.path.abspath(os.path.join(repo_root, card.file_path))
 
     # Защита от path traversal
     if not requested_path.startswith(repo_root + os.sep):
         raise ValueError("Некорректный путь к файлу")
 
-    if not os.path.isfile(requested_path):
-        raise ValueError("Файл не найден")
+    if os.path.isfile(requested_path):
+        return source_cache.get(requested_path)
+    if card.file_hash and os.path.isdir(repo_root):
+        return source_cache.get_blob(repo_root, card.file_hash)
+    raise ValueError("Файл не найден")
 
-    if Path(requested_path).suffix.lower() != ".py":
-        raise ValueError("Поддерживаются только .py файлы")
 
-    # Шаг 4: Извлекаем блок кода
-    try:
-        block = find_python_entity_block(requested_path, card.kind, card.full_name)
-    except ValueError as exc:
-        raise ValueError(str(exc))
+def _read_card_code(entry: SourceEntry, card: Card) -> Dict:
+    """Возвращает блок кода карточки из содержимого файла"""
+    # Быстрый путь — вырезаем блок по смещениям, сохранённым при сканировании
+    if card.start_byte is not None and entry.blob_hash == card.file_hash:
+        return {
+            "start_line": card.start_line,
+            "end_line": card.end_line,
+            "code": entry.data[card.start_byte : card.end_byte].decode("utf-8"),
+        }
 
-    # Шаг 5: Возвращаем ответ
+    # Файл изменился после сканирования — ищем блок по индексу сущностей
+    try:
+        index = entry.index
+    except SyntaxError as exc:
+        raise ValueError(f"Syntax error in file: {card.file_path}") from exc
+    block = entity_block_from_index(entry.data, index, card.kind, card.full_name)
     return {
         "start_line": block["start_line"],
         "end_line": block["end_line"],
@@ -62,6 +149,71 @@ def get_code(db: Session, card_id: UUID):
     }
 
 
+def read_card_code(repo: Repository, card: Card, rev: Optional[str] = None) -> Dict:
+    """Читает код карточки с диска или из git — без обращений к БД.
+
+    Вызывается из асинхронных эндпоинтов в пуле потоков, чтобы чтение
+    файлов не блокировало event loop.
+    """
+    entry = _load_card_source(repo, card, rev)
+    return _read_card_code(entry, card)
+
+
+def read_codes(
+    repos: Dict[UUID, Optional[Repository]], cards: List[Card]
+) -> Dict[UUID, Dict]:
+    """Читает код для пачки карточек, открывая каждый файл один раз.
+
+    repos — репозитории карточек по id. Карточки, код которых получить не
+    удалось, в результат не попадают.
+    """
+    by_file: Dict[Tuple[UUID, str], List[Card]] = {}
+    for card in cards:
+        by_file.setdefault((card.repository_id, card.file_path), []).append(card)
+
+    codes = {}
+    for (repository_id, _), file_cards in by_file.items():
+        repo = repos.get(repository_id)
+        if repo is None:
+            continue
+        try:
+            entry = _load_card_source(repo, file_cards[0])
+        except (OSError, ValueError):
+            continue
+        for card in file_cards:
+            try:
+                codes[card.id] = _read_card_code(entry, card)
+            except ValueError:
+                continue
+    return codes
+
+
+def get_code(db: Session, card_id: UUID, rev: Optional[str] = None):
+    # Шаг 1: Получаем карточку по ID
+    card = db.get(Card, card_id)
+    if not card:
+        raise ValueError(f"Карточка с id={card_id} не найдена")
+
+    # Шаг 2: Получаем репозиторий
+    repo = db.exec(
+        select(Repository).where(Repository.id == card.repository_id)
+    ).first()
+    if not repo:
+        raise ValueError(f"Репозиторий с id={card.repository_id} не найден")
+
+    # Шаг 3: Извлекаем блок кода из рабочего дерева или коммита rev
+    return read_card_code(repo, card, rev)
+
+
+def get_codes(db: Session, cards: List[Card]) -> Dict[UUID, Dict]:
+    """Читает код для пачки карточек; репозитории загружаются из БД"""
+    repos = {
+        repository_id: db.get(Repository, repository_id)
+        for repository_id in {card.repository_id for card in cards}
+    }
+    return read_codes(repos, cards)
+
+
 def _resolve_repository(
     repo_path: str, repository_id: Optional[UUID], db: Session
 ) -> Repository:
@@ -102,145 +254,1004 @@ def _get_session(db):
     return next(gen), gen
 
 
+class FileTask(NamedTuple):
+    """Файл для разбора: из рабочего дерева (file_path) или из git (blob_sha)"""
+
+    rel_path: str
+    ext: str
+    file_path: Optional[str] = None
+    repo_path: Optional[str] = None
+    blob_sha: Optional[str] = None
+
+
+def _iter_repo_files(repo_path: str) -> Iterator[FileTask]:
+    """Обходит рабочее дерево репозитория и возвращает задачи разбора.
+
+    Файлы идут по возрастанию относительного пути как строки — в том же
+    порядке, что и в git ls-tree: папка сравнивается с соседями как имя
+    с "/" на конце. На этот порядок опирается потоковая сверка с карточками.
+    """
+
+    def walk(dir_path: str, prefix: str) -> Iterator[FileTask]:
+        try:
+            with os.scandir(dir_path) as it:
+                entries = [
+                    (entry.name + "/" if entry.is_dir() else entry.name, entry)
+                    for entry in it
+                    if entry.name not in IGNORE_NAMES or not entry.is_dir()
+                ]
+        except OSError:
+            return
+        entries.sort(key=lambda item: item[0])
+        for sort_name, entry in entries:
+            rel_path = prefix + entry.name
+            if sort_name.endswith("/"):
+                # Как os.walk: по ссылкам на папки не спускаемся
+                if not entry.is_symlink():
+                    yield from walk(entry.path, rel_path + "/")
+                continue
+            ext = Path(entry.name).suffix.lower()
+            if ext in EXTENSIONS:
+                yield FileTask(rel_path, ext, file_path=entry.path)
+
+    yield from walk(repo_path, "")
+
+
+def _iter_commit_files(
+    repo_path: str, rev: str, rel_paths: Optional[Set[str]] = None
+) -> Iterator[FileTask]:
+    """Перебирает файлы дерева коммита без рабочего дерева"""
+    for rel_path, blob_sha in iter_commit_blobs(repo_path, rev):
+        if rel_paths is not None and rel_path not in rel_paths:
+            continue
+        if not _is_supported_path(rel_path):
+            continue
+        yield FileTask(
+            rel_path,
+            Path(rel_path).suffix.lower(),
+            repo_path=repo_path,
+            blob_sha=blob_sha,
+        )
+
+
+def _is_supported_path(rel_path: str) -> bool:
+    """Проверяет, что файл попадает в сканирование (расширение и игнор-список)"""
+    parts = Path(rel_path).parts
+    if any(part in IGNORE_NAMES for part in parts[:-1]):
+        return False
+    return Path(rel_path).suffix.lower() in EXTENSIONS
+
+
+def _iter_selected_files(repo_path: str, rel_paths: Set[str]) -> Iterator[FileTask]:
+    """Возвращает задачи разбора только для указанных файлов"""
+    for rel_path in sorted(rel_paths):
+        file_path_abs = os.path.join(repo_path, rel_path)
+        if os.path.isfile(file_path_abs):
+            yield FileTask(
+                rel_path, Path(rel_path).suffix.lower(), file_path=file_path_abs
+            )
+
+
+def _get_head_commit(repo_path: str) -> Optional[str]:
+    """Возвращает SHA текущего HEAD или None, если это не git-репозиторий"""
+    try:
+        return git.Repo(repo_path).head.commit.hexsha
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError, ValueError):
+        return None
+
+
+def _get_changed_paths(
+    repo_path: str, old_commit: str, new_commit: str
+) -> Optional[Tuple[Set[str], Set[str], List[Tuple[str, str]]]]:
+    """Собирает изменённые, удалённые и переименованные файлы между коммитами.
+
+    Возвращает None, если diff построить нельзя (например, старый коммит
+    пропал после force-push) — тогда нужно полное сканирование.
+    """
+    changed: Set[str] = set()
+    deleted: Set[str] = set()
+    renamed: List[Tuple[str, str]] = []
+    if old_commit == new_commit:
+        return changed, deleted, renamed
+
+    try:
+        repo = git.Repo(repo_path)
+        diffs = repo.commit(old_commit).diff(repo.commit(new_commit))
+    except (git.BadName, git.GitCommandError, ValueError) as e:
+        logger.warning(f"Не удалось получить diff {old_commit}..{new_commit}: {e}")
+        return None
+
+    for diff in diffs:
+        old_ok = diff.a_path is not None and _is_supported_path(diff.a_path)
+        new_ok = diff.b_path is not None and _is_supported_path(diff.b_path)
+        if diff.change_type == "D":
+            if old_ok:
+                deleted.add(diff.a_path)
+        elif diff.change_type == "R":
+            if old_ok and new_ok:
+                renamed.append((diff.a_path, diff.b_path))
+            elif old_ok:
+                deleted.add(diff.a_path)
+            if new_ok:
+                changed.add(diff.b_path)
+        elif new_ok:
+            changed.add(diff.b_path)
+    return changed, deleted, renamed
+
+
+def _has_outdated_hashes(db_session: Session, repository_id: UUID) -> bool:
+    """Есть ли у репозитория карточки, посчитанные другой версией парсера или анализа"""
+    outdated = db_session.exec(
+        select(Card.id)
+        .where(
+            Card.repository_id == repository_id,
+            or_(
+                col(Card.hash_version).is_(None),
+                col(Card.hash_version).not_in(list(CARD_VERSIONS.values())),
+            ),
+        )
+        .limit(1)
+    ).first()
+    return outdated is not None
+
+
+def _number_duplicates(entities: List[Dict]) -> List[Dict]:
+    """Добавляет суффикс #N к повторяющимся именам в рамках одного файла"""
+    seen_names = {}
+    final_entities = []
+    for ent in entities:
+        name = ent["full_name"]
+        if name in seen_names:
+            seen_names[name] += 1
+            new_name = f"{name}#{seen_names[name]}"
+            ent = ent.copy()
+            ent["full_name"] = new_name
+        else:
+            seen_names[name] = 1
+        final_entities.append(ent)
+    return final_entities
+
+
+class ParsedFile(NamedTuple):
+    rel_path: str
+    entities: Optional[List[Dict]]
+    error: Optional[str]
+    blob_hash: Optional[str] = None
+    cache_hit: bool = False
+    # Время чтения и хэширования содержимого с поиском в кэше и время разбора
+    hash_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    imports: Optional[List[Dict]] = None
+    analysis_hits: int = 0
+    analysis_misses: int = 0
+
+
+def _parse_file(task: FileTask) -> ParsedFile:
+    """Разбирает и анализирует один файл, используя кэш разбора по хэшу
+    содержимого и кэш анализа по ast_hash сущностей
+    """
+    rel_path, ext = task.rel_path, task.ext
+    started = time.perf_counter()
+    data = None
+
+    def load_source() -> str:
+        # При попадании в кэш разбора содержимое нужно, только если
+        # каких-то сущностей нет в кэше анализа
+        nonlocal data
+        if data is None:
+            data = read_blob(task.repo_path, task.blob_sha)
+        return data.decode("utf-8")
+
+    try:
+        if task.blob_sha:
+            # Хэш blob-объекта известен заранее — содержимое читаем только при промахе
+            blob_hash = task.blob_sha
+        else:
+            with open(task.file_path, "rb") as f:
+                data = f.read()
+            blob_hash = git_blob_hash(data)
+
+        cache = get_parse_cache()
+        version = PARSER_VERSIONS[ext]
+        module = cache.get(blob_hash, version) if cache else None
+        cache_hit = module is not None
+        hashed = time.perf_counter()
+        nodes = None
+        if module is None:
+            extractor = EXTENSIONS[ext]
+            module = extractor(load_source())
+            # Узлы AST только что разобранного файла — анализаторам, не в кэш
+            nodes = module.pop("nodes", None)
+            module["entities"] = _number_duplicates(module["entities"])
+            if cache:
+                cache.put(blob_hash, version, module)
+        analysis_hits, analysis_misses = ANALYSIS[ext](
+            module["entities"], load_source, cache, nodes
+        )
+    except Exception as e:
+        return ParsedFile(rel_path, None, str(e))
+
+    return ParsedFile(
+        rel_path,
+        module["entities"],
+        None,
+        blob_hash,
+        cache_hit,
+        hashed - started,
+        time.perf_counter() - hashed,
+        module["imports"],
+        analysis_hits,
+        analysis_misses,
+    )
+
+
+def _parse_chunk(tasks: List[FileTask]) -> List[ParsedFile]:
+    """Разбирает порцию файлов в процессе-обработчике"""
+    return [_parse_file(task) for task in tasks]
+
+
+def _init_worker():
+    # Соединения пула унаследованы от родителя при fork — их нельзя закрывать
+    engine.dispose(close=False)
+
+
+def _iter_parsed_files(
+    tasks: Iterator[FileTask], workers: int, chunk_size: int
+) -> Iterator[ParsedFile]:
+    """Разбирает файлы последовательно или в пуле процессов, сохраняя порядок"""
+    if workers <= 1:
+        for task in tasks:
+            yield _parse_file(task)
+        return
+
+    def chunks():
+        chunk = []
+        for task in tasks:
+            chunk.append(task)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        # Держим ограниченное число порций в работе, чтобы не читать весь обход сразу
+        pending = deque()
+        for chunk in chunks():
+            pending.append(pool.submit(_parse_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _batched(items: List, size: int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _upsert_cards(db_session: Session, rows: List[Dict]):
+    """Вставляет новые карточки и обновляет изменившиеся (INSERT ... ON CONFLICT)"""
+    table = Card.__table__
+    for batch in _batched(rows, config.SCAN_DB_BATCH_SIZE):
+        stmt = insert(table).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                table.c.repository_id,
+                table.c.file_path,
+                table.c.full_name,
+            ],
+            set_={
+                "kind": stmt.excluded.kind,
+                "ast_hash": stmt.excluded.ast_hash,
+                "minhash": stmt.excluded.minhash,
+                "lsh_bands": stmt.excluded.lsh_bands,
+                "hash_version": stmt.excluded.hash_version,
+                "error_message": stmt.excluded.error_message,
+                "start_line": stmt.excluded.start_line,
+                "end_line": stmt.excluded.end_line,
+                "start_byte": stmt.excluded.start_byte,
+                "end_byte": stmt.excluded.end_byte,
+                "file_hash": stmt.excluded.file_hash,
+                "signature": stmt.excluded.signature,
+                "severity": stmt.excluded.severity,
+                "findings": stmt.excluded.findings,
+                "update_at": func.now(),
+            },
+            # Не трогаем строку, если ни сущность, ни файл, ни версия
+            # парсера не изменились
+            where=table.c.ast_hash.is_distinct_from(stmt.excluded.ast_hash)
+            | table.c.file_hash.is_distinct_from(stmt.excluded.file_hash)
+            | table.c.hash_version.is_distinct_from(stmt.excluded.hash_version),
+        )
+        db_session.execute(stmt)
+
+
+def _compact_pick_seq(db_session: Session, repository_id: UUID):
+    """Перенумеровывает pick_seq карточек репозитория в 0..N-1 без дыр"""
+    table = Card.__table__
+    ranked = (
+        select(
+            table.c.id,
+            (
+                func.row_number().over(
+                    order_by=(
+                        table.c.pick_seq.asc().nulls_last(),
+                        table.c.seq,
+                        table.c.id,
+                    )
+                )
+                - 1
+            ).label("new_pick_seq"),
+        )
+        .where(table.c.repository_id == repository_id)
+        .subquery()
+    )
+    db_session.execute(
+        update(table)
+        .where(table.c.id == ranked.c.id)
+        .where(table.c.pick_seq.is_distinct_from(ranked.c.new_pick_seq))
+        # Перенумерация — служебная операция, update_at не трогаем
+        .values(pick_seq=ranked.c.new_pick_seq, update_at=table.c.update_at)
+    )
+
+
+class _LoadedCards:
+    """Существующие карточки, загруженные целиком и сгруппированные по файлам"""
+
+    def __init__(self, rows: Iterable):
+        self._by_file: Dict[str, Dict[str, Tuple]] = {}
+        for row in rows:
+            self._by_file.setdefault(row.file_path, {})[row.full_name] = row
+
+    def for_file(self, rel_path: str) -> Tuple[Dict[str, Tuple], List[Tuple]]:
+        """Карточки файла по full_name и карточки файлов, пропущенных до него"""
+        return self._by_file.pop(rel_path, {}), []
+
+    def rest(self) -> Iterator[Tuple]:
+        """Карточки файлов, которые так и не встретились при обходе"""
+        for cards in self._by_file.values():
+            yield from cards.values()
+        self._by_file.clear()
+
+
+class _StreamedCards:
+    """Существующие карточки, читаемые серверным курсором по возрастанию
+    (file_path, full_name) и сверяемые с файлами, идущими в том же порядке.
+
+    В памяти — только карточки текущего файла и порция курсора. Карточки
+    файлов, которые обход пропустил (файл удалён), отдаются как устаревшие.
+    """
+
+    def __init__(self, rows: Iterable):
+        self._rows = iter(rows)
+        self._next = next(self._rows, None)
+        self._last_path: Optional[str] = None
+
+    def for_file(self, rel_path: str) -> Tuple[Dict[str, Tuple], List[Tuple]]:
+        if self._last_path is not None and rel_path <= self._last_path:
+            raise ValueError(
+                f"Файлы для потоковой сверки идут не по порядку: "
+                f"{rel_path} после {self._last_path}"
+            )
+        self._last_path = rel_path
+        skipped = []
+        while self._next is not None and self._next.file_path < rel_path:
+            skipped.append(self._next)
+            self._next = next(self._rows, None)
+        cards = {}
+        while self._next is not None and self._next.file_path == rel_path:
+            cards[self._next.full_name] = self._next
+            self._next = next(self._rows, None)
+        return cards, skipped
+
+    def rest(self) -> Iterator[Tuple]:
+        while self._next is not None:
+            yield self._next
+            self._next = next(self._rows, None)
+
+
+class _Spool:
+    """Последовательность записей, нужных после обхода: в списке или, в
+    потоковом режиме, во временном файле, чтобы не держать их в памяти
+    """
+
+    def __init__(self, on_disk: bool):
+        self._items: List = []
+        self._file = tempfile.TemporaryFile() if on_disk else None
+
+    def append(self, item):
+        if self._file is None:
+            self._items.append(item)
+        else:
+            pickle.dump(item, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def __iter__(self) -> Iterator:
+        if self._file is None:
+            yield from self._items
+            return
+        self._file.seek(0)
+        while True:
+            try:
+                yield pickle.load(self._file)
+            except EOFError:
+                return
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _rss_bytes() -> int:
+    """Текущий RSS процесса по /proc; где его нет — пиковый за время жизни"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # В Linux ru_maxrss в килобайтах
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _delete_cards(db_session: Session, ids: List[UUID]):
+    """Удаляет карточки одним DELETE ... WHERE id = ANY(...) на порцию"""
+    table = Card.__table__
+    stmt = delete(table).where(
+        table.c.id == any_(bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+    )
+    for batch in _batched(ids, config.SCAN_DB_BATCH_SIZE):
+        db_session.execute(stmt, {"ids": batch})
+
+
+# Файл, его импорты и ссылки сущностей: (file_path, imports, [(full_name, kind, refs)])
+DependencySource = Tuple[str, List[Dict], List[Tuple[str, str, List[str]]]]
+
+
+def _sync_dependencies(
+    db_session: Session,
+    repository_id: UUID,
+    sources: Iterable[DependencySource],
+    scanned_paths: Set[str],
+    removed_paths: Set[str],
+    full: bool,
+) -> Tuple[int, int]:
+    """Перезаписывает импорты и ссылки разобранных файлов.
+
+    Импорты разрешаются по всем модулям репозитория: при инкрементальном
+    сканировании это просканированные файлы и уже известные по карточкам
+    и импортам. Возвращает число записанных импортов и ссылок.
+    """
+    tables = (FileImport.__table__, CardReference.__table__)
+    if full:
+        known = set(scanned_paths)
+        for table in tables:
+            db_session.execute(
+                delete(table).where(table.c.repository_id == repository_id)
+            )
+    elif not scanned_paths and not removed_paths:
+        return 0, 0
+    else:
+        known = set(
+            db_session.exec(
+                select(Card.file_path)
+                .where(Card.repository_id == repository_id)
+                .distinct()
+            ).all()
+        )
+        known.update(
+            db_session.exec(
+                select(FileImport.file_path)
+                .where(FileImport.repository_id == repository_id)
+                .distinct()
+            ).all()
+        )
+        known = (known | scanned_paths) - removed_paths
+        stale = list(scanned_paths | removed_paths)
+        for table in tables:
+            stmt = delete(table).where(
+                table.c.repository_id == repository_id,
+                table.c.file_path == any_(bindparam("paths", type_=ARRAY(String))),
+            )
+            for batch in _batched(stale, config.SCAN_DB_BATCH_SIZE):
+                db_session.execute(stmt, {"paths": batch})
+
+    index = ModuleIndex(known)
+    written = [0, 0]
+    batches: Tuple[List[Dict], List[Dict]] = ([], [])
+
+    def insert_rows(i: int):
+        for row in batches[i]:
+            row["id"] = uuid4()
+            row["repository_id"] = repository_id
+        db_session.execute(insert(tables[i]).values(batches[i]))
+        written[i] += len(batches[i])
+        batches[i].clear()
+
+    for rel_path, imports, entities in sources:
+        batches[0].extend(import_rows(imports, rel_path, index))
+        batches[1].extend(reference_rows(rel_path, imports, entities, index))
+        for i in (0, 1):
+            if len(batches[i]) >= config.SCAN_DB_BATCH_SIZE:
+                insert_rows(i)
+    for i in (0, 1):
+        if batches[i]:
+            insert_rows(i)
+    return written[0], written[1]
+
+
+def _sync_duplicates(
+    db_session: Session, repository_id: UUID, hashes: Optional[Set[bytes]]
+) -> int:
+    """Обновляет находку «дублирование» у карточек с затронутыми ast_hash.
+
+    Дубликат — другая карточка репозитория с тем же ast_hash, если сама
+    карточка не короче ANALYSIS_DUPLICATE_MIN_LINES. Проверяются только
+    хэши записанных и удалённых при сканировании карточек — у остальных
+    состав копий не изменился; None — все карточки репозитория, они
+    читаются серверным курсором. Возвращает число обновлённых карточек.
+    """
+    table = Card.__table__
+    other = aliased(Card)
+    min_lines = config.ANALYSIS_DUPLICATE_MIN_LINES
+    query = select(
+        Card.id,
+        Card.findings,
+        Card.start_line,
+        Card.end_line,
+        exists()
+        .where(
+            other.repository_id == Card.repository_id,
+            other.ast_hash == Card.ast_hash,
+            other.id != Card.id,
+        )
+        .label("duplicate"),
+    ).where(Card.repository_id == repository_id)
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("card_id"))
+        .values(
+            findings=bindparam("new_findings"),
+            severity=bindparam("new_severity"),
+            error_message=bindparam("new_error_message"),
+        )
+    )
+
+    def batches() -> Iterator[List]:
+        if hashes is None:
+            yield from db_session.execute(
+                query.execution_options(yield_per=config.SCAN_DB_BATCH_SIZE)
+            ).partitions()
+            return
+        by_hash = query.where(
+            Card.ast_hash == any_(bindparam("hashes", type_=ARRAY(BYTEA)))
+        )
+        for batch in _batched(list(hashes), config.SCAN_DB_BATCH_SIZE):
+            yield db_session.execute(by_hash, {"hashes": batch}).all()
+
+    updated = 0
+    for rows in batches():
+        changes = []
+        for row in rows:
+            findings = row.findings or []
+            duplicate = (
+                row.duplicate
+                and min_lines > 0
+                and row.start_line is not None
+                and row.end_line - row.start_line + 1 >= min_lines
+            )
+            marked = any(item["analyzer"] == DUPLICATE_ANALYZER for item in findings)
+            if duplicate == marked:
+                continue
+            findings = [
+                item for item in findings if item["analyzer"] != DUPLICATE_ANALYZER
+            ]
+            if duplicate:
+                findings.append(duplicate_finding())
+            severity, error_message = summarize(findings)
+            changes.append(
+                {
+                    "card_id": row.id,
+                    "new_findings": findings,
+                    "new_severity": severity,
+                    "new_error_message": error_message,
+                }
+            )
+        if changes:
+            db_session.execute(stmt, changes)
+            updated += len(changes)
+    return updated
+
+
+def _record_scan_metrics(summary: Dict, stages: Dict[str, float], duration: float):
+    for stage, seconds in stages.items():
+        SCAN_STAGE_DURATION.labels(stage).observe(seconds)
+    SCAN_STAGE_DURATION.labels("total").observe(duration)
+    SCAN_FILES.labels("parsed").inc(summary["files"] - summary["file_errors"])
+    SCAN_FILES.labels("error").inc(summary["file_errors"])
+    SCAN_ENTITIES.inc(summary["entities"])
+    SCAN_FILES_PER_SECOND.set(summary["files_per_second"])
+    SCAN_ENTITIES_PER_SECOND.set(summary["entities_per_second"])
+    PARSE_CACHE_LOOKUPS.labels("hit").inc(summary["parse_cache_hits"])
+    PARSE_CACHE_LOOKUPS.labels("miss").inc(summary["parse_cache_misses"])
+    ANALYSIS_CACHE_LOOKUPS.labels("hit").inc(summary["analysis_cache_hits"])
+    ANALYSIS_CACHE_LOOKUPS.labels("miss").inc(summary["analysis_cache_misses"])
+    SCAN_PEAK_RSS_BYTES.set(summary["peak_rss_mb"] * 2**20)
+
+
 def scan_repo(
     repo_path: str,
     repository_id: Optional[UUID] = None,
     db: Session = Depends(get_db),  # если вызывается как зависимость FastAPI
+    workers: Optional[int] = None,
+    incremental: bool = False,
+    progress: Optional[Callable[..., None]] = None,
+    rev: Optional[str] = None,
+    streaming: Optional[bool] = None,
 ):
+    """Сканирует репозиторий и синхронизирует карточки.
+
+    С rev файлы читаются из дерева указанного коммита через git, без
+    рабочего дерева (подходит и для bare-репозиториев). progress, если
+    передан, вызывается как progress(event, **counters) после разбора
+    каждого файла (file_parsed) и фиксации каждой пачки карточек
+    (batch_committed). Карточки фиксируются пачками по
+    SCAN_COMMIT_BATCH_SIZE, поэтому доступны до конца сканирования.
+    Возвращает сводку сканирования (счётчики, время этапов, скорость),
+    которая также пишется в лог.
+
+    streaming (по умолчанию SCAN_STREAMING) — режим для очень больших
+    репозиториев: существующие карточки читаются серверным курсором
+    порциями по SCAN_STREAM_BATCH_SIZE и сверяются с файлами по порядку
+    путей, импорты и ссылки до конца обхода лежат во временном файле.
+    Строки карточек в памяти не копятся, но множество просканированных
+    путей и индекс модулей для разрешения импортов по-прежнему хранят
+    каждый путь репозитория.
+    """
     repo_path = os.path.abspath(os.path.normpath(repo_path))
     if not os.path.isdir(repo_path):
         raise ValueError(f"Это не папка: {repo_path}")
 
-    # Только папки и точные имена файлов для пропуска при os.walk
-    IGNORE_NAMES = {
-        "__pycache__",
-        ".git",
-        ".venv",
-        "venv",
-        "env",
-        "node_modules",
-        ".mypy_cache",
-        ".pytest_cache",
-        "build",
-        "dist",
-        ".tox",
-        "Thumbs.db",
-        ".DS_Store",
-    }
-
-    def should_ignore(path: str) -> bool:
-        return os.path.basename(path) in IGNORE_NAMES
+    if workers is None:
+        workers = config.SCAN_WORKERS
+    if streaming is None:
+        streaming = config.SCAN_STREAMING
 
+    scan_started = time.perf_counter()
+    stages = {"walk": 0.0, "hash": 0.0, "parse": 0.0, "db_sync": 0.0}
+    peak_rss = _rss_bytes()
     db_session, db_gen = _get_session(db)
+    reader = None
+    # Импорты и ссылки разрешаются в конце, когда известны все модули
+    dependency_sources = _Spool(on_disk=streaming)
     try:
         repo = _resolve_repository(repo_path, repository_id, db_session)
         db_session.commit()
+        repo_id = repo.id
 
-        # 🔹 Шаг 1: Загрузить все существующие карточки для этого репозитория
-        existing_cards = db_session.exec(
-            select(Card).where(Card.repository_id == repo.id)
-        ).all()
-        existing_key_to_card: Dict[Tuple[str, str], Card] = {
-            (card.file_path, card.full_name): card for card in existing_cards
-        }
-        existing_keys: Set[Tuple[str, str]] = set(existing_key_to_card.keys())
-
-        # 🔹 Шаг 2: Собрать новые сущности из файлов
-        new_key_to_entity: Dict[Tuple[str, str], dict] = {}
-
-        for root, dirs, files in os.walk(repo_path):
-            # Модифицируем dirs in-place — os.walk это поддерживает
-            dirs[:] = [d for d in dirs if not should_ignore(os.path.join(root, d))]
-            for file in files:
-                ext = Path(file).suffix.lower()
-                if ext not in EXTENSIONS:
-                    continue  # пропускаем неподдерживаемые расширения
-
-                file_path_abs = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path_abs, repo_path)
-
-                print(f"Сканирование: {rel_path}")
-                try:
-                    extractor = EXTENSIONS[ext]
-                    entities = extractor(file_path_abs)
-                except Exception as e:
-                    print(f"  ❌ Ошибка при разборе {rel_path}: {e}")
-                    continue
-
-                # Обработка дубликатов имён в рамках одного файла
-                seen_names = {}
-                final_entities = []
-                for ent in entities:
-                    name = ent["full_name"]
-                    if name in seen_names:
-                        seen_names[name] += 1
-                        new_name = f"{name}#{seen_names[name]}"
-                        ent = ent.copy()
-                        ent["full_name"] = new_name
-                    else:
-                        seen_names[name] = 1
-                    final_entities.append(ent)
-
-                for ent in final_entities:
-                    key = (rel_path, ent["full_name"])
-                    new_key_to_entity[key] = ent
-
-        # 🔹 Шаг 3: Синхронизация — обновление и вставка
-        new_keys: Set[Tuple[str, str]] = set(new_key_to_entity.keys())
-
-        for key in new_keys:
-            ent = new_key_to_entity[key]
-            ast_hash_new = ent["ast_hash"]
-            error_msg = "TODO: implement analysis"
-
-            if key in existing_key_to_card:
-                # Существующая запись — проверяем хэш
-                card = existing_key_to_card[key]
-                if card.ast_hash != ast_hash_new:
-                    # Обновляем только если хэш изменился
-                    card.ast_hash = ast_hash_new
-                    card.error_message = error_msg
-                    # Можно обновить другие поля, если нужно
-                    db_session.add(card)
+        if rev:
+            head_commit = resolve_commit(repo_path, rev)
+        else:
+            head_commit = _get_head_commit(repo_path)
+        changes = None
+        # Файлы, которых больше нет под прежним путём (удалены или переименованы)
+        removed_paths: Set[str] = set()
+        if incremental and repo.last_scanned_commit and head_commit:
+            if _has_outdated_hashes(db_session, repo.id):
+                # Хэши прежней версии парсера несравнимы с новыми —
+                # пересчитываем все карточки, а не только изменённые файлы
+                logger.info("Версия парсера изменилась — полное сканирование")
+            else:
+                changes = _get_changed_paths(
+                    repo_path, repo.last_scanned_commit, head_commit
+                )
+
+        # 🔹 Шаг 1: Существующие карточки для этого репозитория
+        # Только нужные колонки, без ORM-объектов
+        existing_query = select(
+            Card.id,
+            Card.file_path,
+            Card.full_name,
+            Card.ast_hash,
+            Card.file_hash,
+            Card.hash_version,
+        ).where(Card.repository_id == repo.id)
+        if changes is None:
+            source_cache.invalidate_prefix(repo_path)
+            if rev:
+                tasks = _iter_commit_files(repo_path, head_commit)
+            else:
+                tasks = _iter_repo_files(repo_path)
+        else:
+            changed, deleted, renamed = changes
+            logger.info(
+                f"Инкрементальное сканирование {repo.last_scanned_commit[:8]}.."
+                f"{head_commit[:8]}: изменено {len(changed)}, "
+                f"удалено {len(deleted)}, переименовано {len(renamed)}"
+            )
+            removed_paths = deleted | {old_path for old_path, _ in renamed}
+            for rel_path in changed | deleted:
+                source_cache.invalidate(os.path.join(repo_path, rel_path))
+            # Переименованные файлы — переносим карточки, сохраняя их id
+            for old_path, new_path in renamed:
+                source_cache.invalidate(os.path.join(repo_path, old_path))
+                db_session.execute(
+                    update(Card)
+                    .where(Card.repository_id == repo.id, Card.file_path == old_path)
+                    .values(file_path=new_path)
+                )
+            existing_query = existing_query.where(
+                col(Card.file_path).in_(changed | deleted)
+            )
+            if rev:
+                tasks = _iter_commit_files(repo_path, head_commit, changed)
             else:
-                # Новая сущность — создаём
-                db_session.add(
-                    Card(
-                        repository_id=repo.id,
-                        file_path=key[0],
-                        kind=ent["kind"],
-                        full_name=key[1],
-                        ast_hash=ast_hash_new,
-                        error_message=error_msg,
-                        severity=CardSeverity.medium,
-                        status=CardStatus.needs_review,
-                        is_public=False,
-                        gist_url="",
+                tasks = _iter_selected_files(repo_path, changed)
+
+        sync_started = time.perf_counter()
+        if streaming:
+            # Переименования должны быть видны отдельному соединению курсора
+            db_session.commit()
+            reader = engine.connect()
+            # "C" — побайтовый порядок, как у сравнения строк в Python
+            existing = _StreamedCards(
+                reader.execution_options(
+                    stream_results=True, yield_per=config.SCAN_STREAM_BATCH_SIZE
+                ).execute(
+                    existing_query.order_by(
+                        col(Card.file_path).collate("C"),
+                        col(Card.full_name).collate("C"),
                     )
                 )
+            )
+        else:
+            existing = _LoadedCards(db_session.exec(existing_query).all())
+        stages["db_sync"] += time.perf_counter() - sync_started
 
-        # 🔹 Шаг 4: Удаление устаревших (которых больше нет в коде)
-        keys_to_delete = existing_keys - new_keys
-        if keys_to_delete:
-            ids_to_delete = [
-                card.id
-                for card in existing_cards
-                if (card.file_path, card.full_name) in keys_to_delete
-            ]
-            if ids_to_delete:
-                cards_to_delete = db_session.exec(
-                    select(Card).where(col(Card.id).in_(ids_to_delete))
-                ).all()
-                for card in cards_to_delete:
-                    db_session.delete(card)
+        # Новым карточкам выдаём номера после текущего максимума в порядке
+        # разбора — карточки из уже зафиксированных пачек сразу доступны в
+        # ленте по seq. Номера seq не перенумеровываются — это курсор ленты;
+        # дыры от удалённых карточек закрываются только в pick_seq
+        next_seq, next_pick_seq, unnumbered = db_session.exec(
+            select(
+                func.coalesce(func.max(Card.seq) + 1, 0),
+                func.coalesce(func.max(Card.pick_seq) + 1, 0),
+                func.count() - func.count(Card.pick_seq),
+            ).where(Card.repository_id == repo.id)
+        ).one()
 
-        db_session.commit()
+        # 🔹 Шаг 2: Собрать сущности из файлов и записывать их пачками
+        pending_rows: List[Dict] = []
+        # Карточки, которых больше нет в коде, — удаляются порциями
+        stale_ids: List[UUID] = []
+        scanned_paths: Set[str] = set()
+        cache_hits = cache_misses = file_errors = cards_deleted = 0
+        analysis_hits = analysis_misses = 0
+        # ast_hash записанных и удалённых карточек — у них мог измениться
+        # состав дубликатов. При полном потоковом сканировании это почти
+        # все карточки, поэтому проверяется весь репозиторий (None)
+        touched_hashes: Optional[Set[bytes]] = (
+            None if streaming and changes is None else set()
+        )
+        counters = {
+            "files_discovered": 0,
+            "files_parsed": 0,
+            "entities_found": 0,
+            "cards_committed": 0,
+            "batches_committed": 0,
+        }
+
+        def counted(tasks):
+            # Время обхода — это время получения следующего файла от генератора
+            tasks = iter(tasks)
+            while True:
+                walk_started = time.perf_counter()
+                task = next(tasks, None)
+                stages["walk"] += time.perf_counter() - walk_started
+                if task is None:
+                    return
+                counters["files_discovered"] += 1
+                yield task
+
+        def flush():
+            sync_started = time.perf_counter()
+            _upsert_cards(db_session, pending_rows)
+            stages["db_sync"] += time.perf_counter() - sync_started
+            counters["cards_committed"] += len(pending_rows)
+            pending_rows.clear()
+
+        def touch(ast_hash: Optional[bytes]):
+            if touched_hashes is not None and ast_hash is not None:
+                touched_hashes.add(ast_hash)
+
+        def drop(cards: Iterable[Tuple]):
+            for card in cards:
+                stale_ids.append(card.id)
+                touch(card.ast_hash)
+            if len(stale_ids) >= config.SCAN_DB_BATCH_SIZE:
+                delete_stale()
+
+        def delete_stale():
+            nonlocal cards_deleted
+            sync_started = time.perf_counter()
+            _delete_cards(db_session, stale_ids)
+            stages["db_sync"] += time.perf_counter() - sync_started
+            cards_deleted += len(stale_ids)
+            stale_ids.clear()
+
+        def commit_batch():
+            # После фиксации карточки пачки видны в ленте до конца сканирования
+            sync_started = time.perf_counter()
+            db_session.commit()
+            stages["db_sync"] += time.perf_counter() - sync_started
+            counters["batches_committed"] += 1
+            if progress:
+                progress("batch_committed", **counters)
+
+        parsed_files = _iter_parsed_files(
+            counted(tasks), workers, config.SCAN_CHUNK_SIZE
+        )
+        for parsed in parsed_files:
+            rel_path, entities, error, file_hash, cache_hit = parsed[:5]
+            stages["hash"] += parsed.hash_seconds
+            stages["parse"] += parsed.parse_seconds
+            counters["files_parsed"] += 1
+            scanned_paths.add(rel_path)
+            peak_rss = max(peak_rss, _rss_bytes())
+            file_cards, skipped = existing.for_file(rel_path)
+            # Карточки файлов, пропущенных обходом, — файлы удалены
+            drop(skipped)
+            if error is None:
+                counters["entities_found"] += len(entities)
+            if progress:
+                progress("file_parsed", **counters)
+            if error is not None:
+                file_errors += 1
+                logger.warning(f"Ошибка при разборе {rel_path}: {error}")
+                drop(file_cards.values())
+                continue
+
+            if cache_hit:
+                cache_hits += 1
+            else:
+                cache_misses += 1
+            analysis_hits += parsed.analysis_hits
+            analysis_misses += parsed.analysis_misses
+            dependency_sources.append(
+                (
+                    rel_path,
+                    parsed.imports or [],
+                    [
+                        (ent["full_name"], ent["kind"], ent.get("refs", []))
+                        for ent in entities
+                    ],
+                )
+            )
+            hash_version = CARD_VERSIONS[Path(rel_path).suffix.lower()]
+            for ent in entities:
+                card = file_cards.pop(ent["full_name"], None)
+                if (
+                    card is not None
+                    and card.ast_hash == ent["ast_hash"]
+                    and card.file_hash == file_hash
+                    and card.hash_version == hash_version
+                ):
+                    continue  # Ни сущность, ни файл не изменились — обновлять нечего
+                seq = pick_seq = None
+                if card is None:
+                    seq, pick_seq = next_seq, next_pick_seq
+                    next_seq += 1
+                    next_pick_seq += 1
+                else:
+                    touch(card.ast_hash)
+                touch(ent["ast_hash"])
+                findings = ent.get("findings") or []
+                severity, error_message = summarize(findings)
+                pending_rows.append(
+                    {
+                        "id": uuid4(),
+                        "repository_id": repo_id,
+                        "file_path": rel_path,
+                        "kind": ent["kind"],
+                        "full_name": ent["full_name"],
+                        "ast_hash": ent["ast_hash"],
+                        "minhash": ent["minhash"],
+                        "lsh_bands": ent["lsh_bands"],
+                        "hash_version": hash_version,
+                        "start_line": ent["start_line"],
+                        "end_line": ent["end_line"],
+                        "start_byte": ent["start_byte"],
+                        "end_byte": ent["end_byte"],
+                        "file_hash": file_hash,
+                        "signature": ent.get("signature"),
+                        "findings": findings,
+                        "error_message": error_message,
+                        "severity": severity,
+                        "status": CardStatus.needs_review,
+                        "is_public": False,
+                        "gist_url": "",
+                        "seq": seq,
+                        "pick_seq": pick_seq,
+                    }
+                )
+            # Сущности, которых больше нет в файле
+            drop(file_cards.values())
+            if (
+                config.SCAN_COMMIT_BATCH_SIZE > 0
+                and len(pending_rows) >= config.SCAN_COMMIT_BATCH_SIZE
+            ):
+                flush()
+                commit_batch()
+            elif streaming and len(pending_rows) >= config.SCAN_DB_BATCH_SIZE:
+                # Без фиксации пачек строки всё равно не копим в памяти
+                flush()
+
+        # 🔹 Шаг 3: Последняя пачка и удаление устаревших (которых больше нет
+        # в коде) — в одной транзакции с отметкой о просканированном коммите
+        flush()
+        # Карточки файлов после последнего просканированного — файлы удалены
+        drop(existing.rest())
+        delete_stale()
+        sync_started = time.perf_counter()
+        if cards_deleted or unnumbered:
+            _compact_pick_seq(db_session, repo.id)
+        duplicates_updated = _sync_duplicates(db_session, repo.id, touched_hashes)
+        imports_written, references_written = _sync_dependencies(
+            db_session,
+            repo.id,
+            dependency_sources,
+            scanned_paths,
+            removed_paths,
+            full=changes is None,
+        )
+
+        if head_commit:
+            repo.last_scanned_commit = head_commit
+            db_session.add(repo)
+        stages["db_sync"] += time.perf_counter() - sync_started
+        commit_batch()
 
     finally:
+        if reader is not None:
+            reader.close()
+        dependency_sources.close()
         if db_gen:
             try:
                 next(db_gen)
             except StopIteration:
                 pass
 
-    print(f"\n✅ Сканирование завершено. Репозиторий: {repo_path}")
+    duration = time.perf_counter() - scan_started
+    summary = {
+        "repository_id": str(repo_id),
+        "repo_path": repo_path,
+        "commit": head_commit,
+        "incremental": changes is not None,
+        "files": counters["files_parsed"],
+        "file_errors": file_errors,
+        "entities": counters["entities_found"],
+        "cards_written": counters["cards_committed"],
+        "batches_committed": counters["batches_committed"],
+        "cards_deleted": cards_deleted,
+        "imports": imports_written,
+        "references": references_written,
+        "parse_cache_hits": cache_hits,
+        "parse_cache_misses": cache_misses,
+        "analysis_cache_hits": analysis_hits,
+        "analysis_cache_misses": analysis_misses,
+        "duplicates_updated": duplicates_updated,
+        "streaming": streaming,
+        # Пик RSS основного процесса за сканирование (замер после каждого файла)
+        "peak_rss_mb": round(max(peak_rss, _rss_bytes()) / 2**20, 1),
+        "duration_seconds": round(duration, 3),
+        "stages_seconds": {name: round(value, 3) for name, value in stages.items()},
+        "files_per_second": round(counters["files_parsed"] / duration, 1),
+        "entities_per_second": round(counters["entities_found"] / duration, 1),
+    }
+    _record_scan_metrics(summary, stages, duration)
+    logger.info(
+        f"Сканирование завершено: {repo_path} — файлов {summary['files']} "
+        f"(ошибок {file_errors}), сущностей {summary['entities']}, "
+        f"записано {counters['cards_committed']}, удалено {cards_deleted}, "
+        f"кэш {cache_hits}/{cache_hits + cache_misses}, {duration:.2f} с",
+        extra={"scan": summary},
+    )
+    return summary
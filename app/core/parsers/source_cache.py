@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from core.config import config
+from .cache import git_blob_hash
+from .git_source import read_blob
+from .python_parser import index_python_entities
+
+
+class SourceEntry:
+    """Содержимое файла, его blob-хэш и лениво построенный индекс сущностей"""
+
+    def __init__(self, data: bytes, blob_hash: Optional[str] = None):
+        self.data = data
+        self.blob_hash = blob_hash or git_blob_hash(data)
+        self._index: Optional[Dict[str, Tuple]] = None
+
+    @property
+    def index(self) -> Dict[str, Tuple]:
+        if self._index is None:
+            self._index = index_python_entities(self.data.decode("utf-8"))
+        return self._index
+
+
+class SourceCache:
+    """LRU-кэш исходников для чтения карточек, ограниченный числом записей и байтами.
+
+    Запись привязана к (путь, mtime, размер): изменённый на диске файл
+    перечитывается автоматически, а сканер дополнительно сбрасывает
+    записи затронутых файлов.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Ключ — путь к файлу или "репозиторий@sha" для blob-объектов
+        self._entries: "OrderedDict[str, Tuple[Optional[Tuple], SourceEntry]]" = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str) -> SourceEntry:
+        file_path = os.path.abspath(file_path)
+        st = os.stat(file_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            cached = self._entries.get(file_path)
+            if cached is not None and cached[0] == stamp:
+                self._entries.move_to_end(file_path)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        with open(file_path, "rb") as f:
+            entry = SourceEntry(f.read())
+        self._put(file_path, stamp, entry)
+        return entry
+
+    def get_blob(self, repo_path: str, blob_sha: str) -> SourceEntry:
+        """Возвращает содержимое blob-объекта git (неизменяемо, проверка не нужна)"""
+        key = f"{os.path.abspath(repo_path)}@{blob_sha}"
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        entry = SourceEntry(read_blob(repo_path, blob_sha), blob_sha)
+        self._put(key, None, entry)
+        return entry
+
+    def _put(self, key: str, stamp, entry: SourceEntry):
+        with self._lock:
+            self._pop(key)
+            if len(entry.data) <= self.max_bytes:
+                self._entries[key] = (stamp, entry)
+                self._bytes += len(entry.data)
+                while (
+                    len(self._entries) > self.max_entries
+                    or self._bytes > self.max_bytes
+                ):
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted.data)
+
+    def _pop(self, file_path: str):
+        cached = self._entries.pop(file_path, None)
+        if cached is not None:
+            self._bytes -= len(cached[1].data)
+
+    def invalidate(self, file_path: str):
+        with self._lock:
+            self._pop(os.path.abspath(file_path))
+
+    def invalidate_prefix(self, dir_path: str):
+        """Сбрасывает все записи файлов внутри папки (например, после pull)"""
+        prefix = os.path.abspath(dir_path) + os.sep
+        with self._lock:
+            for file_path in [p for p in self._entries if p.startswith(prefix)]:
+                self._pop(file_path)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+source_cache = SourceCache(
+    max_entries=config.SOURCE_CACHE_MAX_ENTRIES,
+    max_bytes=config.SOURCE_CACHE_MAX_MB * 1024 * 1024,
+)
@@ -0,0 +1,129 @@
+import random
+from typing import Collection, Optional
+from uuid import UUID
+
+from sqlmodel import col, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.cards import Card, CardSeverity, CardStatus
+
+# Относительные веса важности карточек при взвешенном выборе
+SEVERITY_WEIGHTS = {
+    CardSeverity.low: 1,
+    CardSeverity.medium: 2,
+    CardSeverity.high: 4,
+    CardSeverity.critical: 8,
+}
+
+# Статусы карточек, которые уже просмотрены пользователем
+REVIEWED_STATUSES = (CardStatus.approved, CardStatus.skipped)
+
+# Сколько случайных номеров проверять одним запросом до перехода на выбор
+# по счётчикам
+MAX_PROBES = 16
+
+
+def _filtered(query, repository_id: UUID, exclude_statuses: Collection[CardStatus]):
+    query = query.where(Card.repository_id == repository_id)
+    if exclude_statuses:
+        query = query.where(col(Card.status).not_in(exclude_statuses))
+    return query
+
+
+async def _pick_by_offset(
+    db: AsyncSession,
+    repository_id: UUID,
+    exclude_statuses: Collection[CardStatus],
+    weighted: bool,
+) -> Optional[Card]:
+    """Равномерный (или взвешенный) выбор по числу подходящих карточек.
+
+    Важность выбирается с вероятностью, пропорциональной числу подходящих
+    карточек с ней (при weighted — ещё и её весу), затем карточка — по
+    случайному смещению среди них.
+    """
+    counts = dict(
+        (
+            await db.exec(
+                _filtered(
+                    select(Card.severity, func.count()),
+                    repository_id,
+                    exclude_statuses,
+                ).group_by(Card.severity)
+            )
+        ).all()
+    )
+    if not counts:
+        return None
+    severities = list(counts)
+    weights = [
+        counts[severity] * (SEVERITY_WEIGHTS.get(severity, 1) if weighted else 1)
+        for severity in severities
+    ]
+    severity = random.choices(severities, weights=weights)[0]
+    query = _filtered(select(Card), repository_id, exclude_statuses).where(
+        Card.severity == severity
+    )
+    # Порядок индекса ix_card_repository_severity_created_id
+    card = (
+        await db.exec(
+            query.order_by(Card.created_at, Card.id)
+            .offset(random.randrange(counts[severity]))
+            .limit(1)
+        )
+    ).first()
+    if card is None:
+        # Карточки удалены между запросами — берём любую из оставшихся
+        card = (await db.exec(query.limit(1))).first()
+    return card
+
+
+async def pick_random_card(
+    db: AsyncSession,
+    repository_id: UUID,
+    exclude_statuses: Collection[CardStatus] = (),
+    weighted: bool = False,
+) -> Optional[Card]:
+    """Выбирает случайную карточку репозитория за несколько запросов по индексу.
+
+    Номера pick_seq плотные (0..N-1), поэтому MAX_PROBES случайных номеров
+    проверяются одним запросом: первая карточка подходящего статуса
+    принимается, при weighted — с вероятностью, пропорциональной весу её
+    важности. Если ни одна не подошла (почти все карточки просмотрены или
+    малого веса), выбор идёт по числу подходящих карточек и случайному
+    смещению — тоже равномерно и с теми же весами.
+    """
+    max_pick_seq = (
+        await db.exec(
+            select(func.max(Card.pick_seq)).where(Card.repository_id == repository_id)
+        )
+    ).one()
+    if max_pick_seq is None:
+        # Репозиторий ещё не пронумерован сканером
+        query = _filtered(select(Card), repository_id, exclude_statuses)
+        return (await db.exec(query.order_by(func.random()))).first()
+
+    probes = [random.randint(0, max_pick_seq) for _ in range(MAX_PROBES)]
+    found = {
+        card.pick_seq: card
+        for card in (
+            await db.exec(
+                select(Card).where(
+                    Card.repository_id == repository_id,
+                    col(Card.pick_seq).in_(set(probes)),
+                )
+            )
+        ).all()
+    }
+    max_weight = max(SEVERITY_WEIGHTS.values())
+    for number in probes:
+        card = found.get(number)
+        if card is None or card.status in exclude_statuses:
+            continue
+        if weighted and random.random() * max_weight >= SEVERITY_WEIGHTS.get(
+            card.severity, 1
+        ):
+            continue
+        return card
+
+    return await _pick_by_offset(db, repository_id, exclude_statuses, weighted)
@@ -0,0 +1,57 @@
+from typing import Dict, Iterable, List
+from uuid import UUID
+
+import orjson
+from starlette.responses import JSONResponse
+
+from models.cards import Card, CardResponse
+
+
+def _default(value):
+    # asyncpg отдаёт UUID собственного подкласса, который orjson не знает
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON-ответ через orjson.
+
+    Эндпоинт, вернувший такой ответ, минует повторную валидацию по
+    response_model и jsonable_encoder — response_model остаётся только для
+    схемы OpenAPI. Даты пишутся с Z, как их сериализует pydantic.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+# Поля CardResponse и соответствующие им колонки — списки карточек выбирают
+# только их, без ORM-объектов и тяжёлых minhash/lsh_bands
+CARD_FIELDS = tuple(CardResponse.model_fields)
+CARD_COLUMNS = tuple(getattr(Card, name) for name in CARD_FIELDS)
+# Дополнительно к CARD_COLUMNS — всё, что нужно scanner.read_codes
+CARD_CODE_COLUMNS = CARD_COLUMNS + (
+    Card.start_line,
+    Card.end_line,
+    Card.start_byte,
+    Card.end_byte,
+    Card.file_hash,
+    Card.seq,
+)
+
+
+def card_to_dict(card) -> Dict:
+    """Поля CardResponse из ORM-объекта или строки результата запроса"""
+    return {name: getattr(card, name) for name in CARD_FIELDS}
+
+
+def cards_to_dicts(cards: Iterable) -> List[Dict]:
+    return [card_to_dict(card) for card in cards]
+
+
+def card_code_to_dict(card, code: Dict) -> Dict:
+    """Поля CardCodeResponse: карточка и её блок кода от scanner.read_card_code"""
+    data = card_to_dict(card)
+    data.update(code)
+    return data
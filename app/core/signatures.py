@@ -0,0 +1,56 @@
+from typing import Dict, List
+from uuid import UUID
+
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.parsers.imports import name_targets
+from models.cards import Card
+from models.dependencies import FileImport
+
+
+async def lookup_signatures(
+    db: AsyncSession, repository_id: UUID, file_path: str, names: List[str]
+) -> Dict[str, object]:
+    """Сигнатуры сущностей, на которые указывают имена из файла file_path.
+
+    Два запроса по индексам: импорты файла и карточки по ключу
+    (repository_id, file_path, full_name) — без чтения и разбора файлов.
+    Возвращает имя → строку карточки; неразрешённых имён в ответе нет.
+    """
+    imports = (
+        await db.exec(
+            select(FileImport).where(
+                FileImport.repository_id == repository_id,
+                FileImport.file_path == file_path,
+            )
+        )
+    ).all()
+    targets = {
+        name: name_targets(name, file_path, imports) for name in dict.fromkeys(names)
+    }
+    target_files = {path for keys in targets.values() for path, _ in keys}
+    target_names = {full_name for keys in targets.values() for _, full_name in keys}
+    if not target_files:
+        return {}
+
+    rows = (
+        await db.exec(
+            select(
+                Card.id, Card.file_path, Card.kind, Card.full_name, Card.signature
+            ).where(
+                Card.repository_id == repository_id,
+                col(Card.file_path).in_(target_files),
+                col(Card.full_name).in_(target_names),
+            )
+        )
+    ).all()
+    found = {(row.file_path, row.full_name): row for row in rows}
+
+    result = {}
+    for name, keys in targets.items():
+        for key in keys:
+            if key in found:
+                result[name] = found[key]
+                break
+    return result
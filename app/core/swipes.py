@@ -0,0 +1,389 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import String, cast, column, tuple_, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import config
+from core.metrics import SWIPE_ACTIONS, SWIPE_FLUSH_DURATION
+from core.utils.logger import setup as setup_logger
+from db.session import engine
+from models import utcnow
+from models.cards import Card, CardStatus
+from models.swipes import SWIPE_STATUSES, SwipeAction, SwipeActionType, SwipeResponse
+
+logger = setup_logger(
+    name="SWIPES",
+    log_path=config.LOG_PATH,
+    DEBUG=config.LOG_DEBUG,
+)
+
+# Сколько раз пытаться записать оставшиеся свайпы при остановке,
+# прежде чем сохранить их в файл
+_SHUTDOWN_ATTEMPTS = 3
+
+
+class _Swipe(NamedTuple):
+    key: str
+    card_id: UUID
+    action: SwipeActionType
+    created_at: datetime
+
+
+def _spool_pattern() -> str:
+    return os.path.join(config.TEMP_REPO_PATH, ".swipes.*.spool")
+
+
+def _spool_path() -> str:
+    # Свой файл у каждого процесса: воркеры uvicorn останавливаются одновременно
+    return os.path.join(config.TEMP_REPO_PATH, f".swipes.{os.getpid()}.spool")
+
+
+def _report_conflicts(db: Session, swipes: List[_Swipe]):
+    """Повторы, записанные в журнал с другим действием.
+
+    Запрос с тем же ключом и другим действием получает 409, но если оба
+    свайпа приняты разными процессами до записи, расхождение видно только
+    здесь — второй свайп отброшен, об этом пишем в лог.
+    """
+    log = SwipeAction.__table__
+    stored = {
+        (row.card_id, row.idempotency_key): row.action
+        for row in db.execute(
+            select(log.c.card_id, log.c.idempotency_key, log.c.action).where(
+                tuple_(log.c.card_id, log.c.idempotency_key).in_(
+                    [(swipe.card_id, swipe.key) for swipe in swipes]
+                )
+            )
+        )
+    }
+    for swipe in swipes:
+        action = stored.get((swipe.card_id, swipe.key))
+        if action is not None and action != swipe.action:
+            SWIPE_ACTIONS.labels("conflict").inc()
+            logger.warning(
+                f"Свайп {swipe.action.value} карточки {swipe.card_id} отброшен: "
+                f"ключ {swipe.key} уже записан для {action.value}"
+            )
+
+
+async def find_swipe_action(
+    db: AsyncSession, card_id: UUID, key: str
+) -> Optional[SwipeActionType]:
+    """Действие, уже записанное в журнал с этим ключом для карточки"""
+    return (
+        await db.exec(
+            select(SwipeAction.action).where(
+                SwipeAction.card_id == card_id, SwipeAction.idempotency_key == key
+            )
+        )
+    ).first()
+
+
+def _apply(db: Session, batch: List[_Swipe]) -> int:
+    """Записывает пачку свайпов двумя запросами: журнал и статусы карточек.
+
+    Свайпы, чьи ключи уже есть в журнале карточки, применены раньше —
+    другим процессом или до перезапуска — и отбрасываются. Из остальных
+    для каждой карточки действует последний. Возвращает число применённых.
+    """
+    unique: Dict[Tuple[UUID, str], _Swipe] = {}
+    for swipe in batch:
+        unique.setdefault((swipe.card_id, swipe.key), swipe)
+    log = SwipeAction.__table__
+    # executemany, а не values(список): скомпилированный запрос кэшируется
+    inserted = {
+        tuple(row)
+        for row in db.execute(
+            insert(log)
+            .on_conflict_do_nothing(index_elements=["card_id", "idempotency_key"])
+            .returning(log.c.card_id, log.c.idempotency_key),
+            [
+                {
+                    "id": uuid4(),
+                    "idempotency_key": swipe.key,
+                    "card_id": swipe.card_id,
+                    "action": swipe.action,
+                    "created_at": swipe.created_at,
+                }
+                for swipe in unique.values()
+            ],
+        )
+    }
+    skipped = [pair for pair in unique if pair not in inserted]
+    if skipped:
+        _report_conflicts(db, [unique[pair] for pair in skipped])
+
+    statuses: Dict[UUID, CardStatus] = {}
+    for pair, swipe in unique.items():
+        if pair in inserted:
+            statuses[swipe.card_id] = SWIPE_STATUSES[swipe.action]
+    if statuses:
+        # UPDATE card ... FROM (VALUES ...) — одна запись на всю пачку
+        cards = Card.__table__
+        rows = values(
+            column("id", PG_UUID(as_uuid=True)), column("status", String), name="v"
+        ).data([(card_id, status.name) for card_id, status in statuses.items()])
+        status = cast(rows.c.status, cards.c.status.type)
+        db.execute(
+            update(cards)
+            .where(cards.c.id == rows.c.id, cards.c.status.is_distinct_from(status))
+            .values(status=status)
+        )
+    SWIPE_ACTIONS.labels("applied").inc(len(inserted))
+    SWIPE_ACTIONS.labels("ignored").inc(len(batch) - len(inserted))
+    return len(inserted)
+
+
+class SwipeBuffer:
+    """Буфер свайпов с отложенной записью в БД.
+
+    Запрос только кладёт свайп в память; фоновый поток записывает буфер
+    пачками, когда в нём набирается SWIPE_FLUSH_SIZE свайпов или проходит
+    SWIPE_FLUSH_INTERVAL секунд. Пока свайп не записан, карточка отдаётся
+    со старым статусом. При остановке буфер дописывается в БД, а если
+    она недоступна — в файл, который загружается при следующем запуске.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Пачки берутся из начала буфера по одной: порядок свайпов сохраняется
+        self._flush_lock = threading.Lock()
+        self._pending: List[_Swipe] = []
+        # Ответы на последние запросы с ключом клиента по (card_id, ключ)
+        self._keys: "OrderedDict[Tuple[UUID, str], SwipeResponse]" = OrderedDict()
+        # Свайпы из файлов прошлого запуска в начале буфера и сами файлы
+        self._spooled = 0
+        self._spool_files: List[str] = []
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._load_spool()
+            self._thread = threading.Thread(
+                target=self._run, name="swipe-flush", daemon=True
+            )
+            self._thread.start()
+
+    def add(
+        self, card_id: UUID, action: SwipeActionType, key: Optional[str] = None
+    ) -> SwipeResponse:
+        """Кладёт свайп в буфер.
+
+        Повтор с тем же ключом возвращает первый ответ и ничего не добавляет;
+        ключ, уже использованный для другого свайпа, — ValueError.
+        """
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            if key is not None and (card_id, key) in self._keys:
+                known = self._keys[(card_id, key)]
+                if known.action != action:
+                    raise ValueError(
+                        f"Ключ идемпотентности {key} уже использован "
+                        f"для свайпа {known.action.value}"
+                    )
+                self._keys.move_to_end((card_id, key))
+                SWIPE_ACTIONS.labels("replayed").inc()
+                return known.model_copy(update={"duplicate": True})
+
+            response = SwipeResponse(
+                card_id=card_id,
+                action=action,
+                status=SWIPE_STATUSES[action],
+                idempotency_key=key or uuid4().hex,
+            )
+            self._pending.append(
+                _Swipe(response.idempotency_key, card_id, action, utcnow())
+            )
+            if key is not None:
+                self._remember(response)
+            if len(self._pending) >= config.SWIPE_FLUSH_SIZE:
+                self._wakeup.set()
+        SWIPE_ACTIONS.labels("accepted").inc()
+        return response
+
+    def knows(self, card_id: UUID, key: str) -> bool:
+        """Есть ли ключ в памяти процесса — иначе его проверяют по журналу"""
+        with self._lock:
+            return (card_id, key) in self._keys
+
+    def remember(self, card_id: UUID, action: SwipeActionType, key: str):
+        """Запоминает свайп, найденный в журнале: повтор с тем же действием
+        получит прежний ответ, с другим — ValueError
+        """
+        with self._lock:
+            self._remember(
+                SwipeResponse(
+                    card_id=card_id,
+                    action=action,
+                    status=SWIPE_STATUSES[action],
+                    idempotency_key=key,
+                )
+            )
+
+    def _remember(self, response: SwipeResponse):
+        self._keys[(response.card_id, response.idempotency_key)] = response
+        while len(self._keys) > config.SWIPE_IDEMPOTENCY_CACHE_SIZE:
+            self._keys.popitem(last=False)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Записывает весь буфер пачками по SWIPE_FLUSH_SIZE.
+
+        Пачка, которую не удалось записать, возвращается в начало буфера,
+        ошибка пробрасывается. Возвращает число применённых свайпов.
+        """
+        applied = 0
+        size = max(config.SWIPE_FLUSH_SIZE, 1)
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:size]
+                    del self._pending[:size]
+                if not batch:
+                    return applied
+                started = time.perf_counter()
+                try:
+                    with Session(engine) as db:
+                        applied += _apply(db, batch)
+                        db.commit()
+                except Exception:
+                    with self._lock:
+                        self._pending[:0] = batch
+                    raise
+                SWIPE_FLUSH_DURATION.observe(time.perf_counter() - started)
+                self._forget_spooled(len(batch))
+
+    def shutdown(self):
+        """Останавливает фоновую запись и дописывает буфер в БД или в файл"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wakeup.set()
+            thread.join()
+        for attempt in range(1, _SHUTDOWN_ATTEMPTS + 1):
+            try:
+                self.flush()
+                return
+            except Exception:
+                logger.exception(
+                    f"Не удалось записать свайпы при остановке "
+                    f"(попытка {attempt} из {_SHUTDOWN_ATTEMPTS})"
+                )
+                if attempt < _SHUTDOWN_ATTEMPTS:
+                    time.sleep(attempt)
+        self._write_spool()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(config.SWIPE_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            if self._thread is not threading.current_thread():
+                # Остановка: остаток буфера дописывает shutdown
+                return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception(
+                    f"Не удалось записать {self.pending()} свайпов, "
+                    f"повтор через {config.SWIPE_FLUSH_INTERVAL} с"
+                )
+
+    def _load_spool(self):
+        loaded = []
+        for path in sorted(glob.glob(_spool_pattern())):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    loaded.append(
+                        _Swipe(
+                            item["key"],
+                            UUID(item["card_id"]),
+                            SwipeActionType(item["action"]),
+                            datetime.fromisoformat(item["created_at"]),
+                        )
+                    )
+            self._spool_files.append(path)
+        if loaded:
+            # Свайпы прошлого запуска старше новых — в начало буфера
+            self._pending[:0] = loaded
+            self._spooled += len(loaded)
+            logger.info(f"Загружено {len(loaded)} несохранённых свайпов из файлов")
+
+    def _forget_spooled(self, count: int):
+        """Файлы прошлого запуска удаляются, когда все их свайпы записаны"""
+        with self._lock:
+            if not self._spooled:
+                return
+            self._spooled = max(self._spooled - count, 0)
+            if self._spooled:
+                return
+            files, self._spool_files = self._spool_files, []
+        for path in files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _write_spool(self):
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return
+        path = _spool_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for swipe in pending:
+                item = {
+                    "key": swipe.key,
+                    "card_id": str(swipe.card_id),
+                    "action": swipe.action.value,
+                    "created_at": swipe.created_at.isoformat(),
+                }
+                f.write(json.dumps(item) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        logger.error(
+            f"{len(pending)} свайпов не записаны в БД и сохранены в {path}, "
+            f"они будут записаны при следующем запуске"
+        )
+
+    def _reset_after_fork(self):
+        # Процессы-обработчики сканера не свайпают: копия буфера родителя
+        # не должна записываться второй раз из дочернего процесса
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._keys = OrderedDict()
+        self._spooled = 0
+        self._spool_files = []
+        self._wakeup = threading.Event()
+        self._thread = None
+
+
+swipe_buffer = SwipeBuffer()
+
+os.register_at_fork(after_in_child=swipe_buffer._reset_after_fork)
+atexit.register(swipe_buffer.shutdown)
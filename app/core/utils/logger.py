@@ -1,6 +1,160 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from core.config import config
+
+# Стандартные атрибуты LogRecord — всё остальное пришло через extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись; поля из extra= попадают в неё как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _DebugSampler(logging.Filter):
+    """Пропускает каждое N-е DEBUG-сообщение из одного места в коде"""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = every
+        self._counters: Dict[Tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every <= 1 or record.levelno != logging.DEBUG:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self._counters.get(key, 0)
+        self._counters[key] = count + 1
+        return count % self.every == 0
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполненной очереди отбрасывает запись.
+
+    Вызывающий поток никогда не ждёт запись на диск или в консоль.
+    """
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Очередь может быть заполнена — ждём, пока поток записи её разберёт
+        self.queue.put(self._sentinel)
+
+
+_lock = threading.Lock()
+_queue_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[_Listener] = None
+_output_handlers: Tuple[logging.Handler, ...] = ()
+
+
+def _file_handler(log_path: str) -> logging.Handler:
+    os.makedirs(log_path, exist_ok=True)
+    log_file = os.path.join(log_path, "application.log")
+    if config.LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file,
+            when=config.LOG_ROTATE_WHEN,
+            backupCount=config.LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+    if config.LOG_MAX_MB > 0:
+        return logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=config.LOG_MAX_MB * 1024 * 1024,
+            backupCount=config.LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+    return logging.FileHandler(log_file, encoding="utf-8")
+
+
+def _start_listener(log_queue: queue.Queue):
+    global _listener
+    _listener = _Listener(log_queue, *_output_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _get_queue_handler(log_path: str, DEBUG: bool) -> logging.Handler:
+    """Общий для всех логгеров QueueHandler и единственный поток записи.
+
+    Куда писать (консоль или файл с ротацией), определяет первый вызов setup.
+    """
+    global _queue_handler, _output_handlers
+    with _lock:
+        if _queue_handler is not None:
+            return _queue_handler
+
+        if config.LOG_JSON:
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(
+                "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
+            )
+        if DEBUG:
+            output = logging.StreamHandler(sys.stdout)
+        else:
+            output = _file_handler(log_path)
+        output.setFormatter(formatter)
+        _output_handlers = (output,)
+
+        log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+        _queue_handler = _DroppingQueueHandler(log_queue)
+        _queue_handler.addFilter(_DebugSampler(config.LOG_DEBUG_SAMPLE_EVERY))
+        _start_listener(log_queue)
+        return _queue_handler
+
+
+def _restart_after_fork():
+    # Поток записи не переживает fork, а блокировки старой очереди могли
+    # остаться захваченными — в дочернем процессе начинаем с новой очереди
+    global _lock
+    _lock = threading.Lock()
+    if _queue_handler is not None:
+        _queue_handler.queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+        _start_listener(_queue_handler.queue)
+
+
+def shutdown():
+    """Дописывает очередь и останавливает поток записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in _output_handlers:
+        handler.flush()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(shutdown)
 
 
 def setup(
@@ -14,23 +168,10 @@ def setup(
     log_level = logging.DEBUG if DEBUG else logging.INFO
     logger.setLevel(log_level)
 
-    formatter = logging.Formatter(
-        "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
-    )
-
-    if DEBUG is False:
-        os.makedirs(log_path, exist_ok=True)
-        log_file = os.path.join(log_path, "application.log")
-
-        file_handler = logging.FileHandler(log_file, encoding="utf-8")
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+    # Запись только кладётся в очередь; форматирует и пишет её фоновый поток
+    logger.addHandler(_get_queue_handler(log_path, DEBUG))
 
     if DEBUG is True:
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
-
         logger.debug("Режим отладки активирован. Логи выводятся в консоль")
 
     return logger
@@ -1,21 +1,51 @@
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from core.config import config
 
-# Формируем URL как раньше
-db_url = URL.create(
-    drivername="postgresql",
-    username=config.DB_USERNAME,
-    password=config.DB_PASSWORD,
-    host=config.DB_HOST,
-    port=config.DB_PORT,
-    database=config.DB_NAME,
+
+def _db_url(drivername: str) -> URL:
+    return URL.create(
+        drivername=drivername,
+        username=config.DB_USERNAME,
+        password=config.DB_PASSWORD,
+        host=config.DB_HOST,
+        port=config.DB_PORT,
+        database=config.DB_NAME,
+    )
+
+
+# Общие настройки пула для синхронного и асинхронного движков
+pool_options = dict(
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
+    pool_recycle=config.DB_POOL_RECYCLE,
+    pool_pre_ping=config.DB_POOL_PRE_PING,
 )
 
-# Создаём движок
-engine = create_engine(db_url, echo=config.DB_ECHO)
+# Синхронный движок — фоновые задачи, сканер и запись
+db_url = _db_url("postgresql")
+engine = create_engine(db_url, echo=config.DB_ECHO, **pool_options)
+
+# Асинхронный движок (asyncpg) — эндпоинты чтения карточек
+async_engine = create_async_engine(
+    _db_url("postgresql+asyncpg"),
+    echo=config.DB_ECHO,
+    connect_args={"statement_cache_size": config.DB_STATEMENT_CACHE_SIZE},
+    **pool_options,
+)
+async_session_maker = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 
 def get_db():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_db():
+    async with async_session_maker() as session:
+        yield session
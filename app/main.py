@@ -1,11 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from api import repositories, cards
+from fastapi.concurrency import run_in_threadpool
+from api import cards, metrics, repositories
+from core.jobs import job_manager
+from core.metrics import MetricsMiddleware
+from core.swipes import swipe_buffer
+from core.utils import logger
+from db.session import async_engine
 import uvicorn
 
-app = FastAPI(title="Swipe Refactor", version="test")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Свайпы, не записанные в БД при прошлой остановке, возвращаются в буфер
+    swipe_buffer.start()
+    yield
+    await run_in_threadpool(swipe_buffer.shutdown)
+    job_manager.shutdown()
+    await async_engine.dispose()
+    logger.shutdown()
+
+
+app = FastAPI(title="Swipe Refactor", version="test", lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(repositories.router)
 app.include_router(cards.router)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=5000, reload=True)
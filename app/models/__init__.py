@@ -2,6 +2,8 @@ from datetime import datetime, timezone
 from .users import User
 from .cards import Card
 from .repositories import Repository
+from .dependencies import CardReference, FileImport
+from .swipes import SwipeAction
 
 
 def utcnow():
@@ -12,4 +14,7 @@ __all__ = [
     "User",
     "Card",
     "Repository",
+    "FileImport",
+    "CardReference",
+    "SwipeAction",
 ]
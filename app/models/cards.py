@@ -1,8 +1,10 @@
 from datetime import datetime, timezone
+from typing import Dict, List, Optional
 from uuid import UUID, uuid4
-from sqlmodel import Column, Field, SQLModel, text
+from sqlmodel import Column, Field, Index, SQLModel, UniqueConstraint, text
 from enum import Enum as PyEnum
-from sqlalchemy.dialects.postgresql import BYTEA
+from sqlalchemy import BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY, BYTEA, JSONB
 
 
 def utcnow():
@@ -48,14 +50,92 @@ class CardBase(SQLModel):
 
 
 class Card(CardBase, table=True):
+    # Ключ карточки внутри репозитория — используется в INSERT ... ON CONFLICT
+    __table_args__ = (
+        UniqueConstraint(
+            "repository_id",
+            "file_path",
+            "full_name",
+            name="uq_card_repository_file_name",
+        ),
+        # Лента по курсору seq и случайный выбор по плотному номеру pick_seq
+        Index("ix_card_repository_seq", "repository_id", "seq"),
+        Index("ix_card_repository_pick_seq", "repository_id", "pick_seq"),
+        # Keyset-пагинация списков карточек по (created_at, id) с фильтрами
+        Index("ix_card_created_id", "created_at", "id"),
+        Index("ix_card_repository_created_id", "repository_id", "created_at", "id"),
+        Index(
+            "ix_card_repository_status_created_id",
+            "repository_id",
+            "status",
+            "created_at",
+            "id",
+        ),
+        Index(
+            "ix_card_repository_severity_created_id",
+            "repository_id",
+            "severity",
+            "created_at",
+            "id",
+        ),
+        # Фильтр по префиксу пути (LIKE 'prefix%') при любой локали БД
+        Index(
+            "ix_card_repository_file_path_prefix",
+            "repository_id",
+            "file_path",
+            postgresql_ops={"file_path": "varchar_pattern_ops"},
+        ),
+        # Точные дубликаты по хэшу AST во всех репозиториях
+        Index("ix_card_ast_hash", "ast_hash"),
+        # Кандидаты в похожие карточки — пересечение LSH-корзин (&&)
+        Index("ix_card_lsh_bands", "lsh_bands", postgresql_using="gin"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     ast_hash: bytes = Field(default=None, sa_column=Column(BYTEA, nullable=True))
+    # MinHash-сигнатура шинглов нормализованного AST и ключи её LSH-корзин
+    minhash: Optional[bytes] = Field(
+        default=None, sa_column=Column(BYTEA, nullable=True)
+    )
+    lsh_bands: Optional[List[int]] = Field(
+        default=None, sa_column=Column(ARRAY(BigInteger), nullable=True)
+    )
+    # Версия парсера, которой посчитаны хэши (например, "py4") — карточки
+    # со старой версией пересчитываются полным сканированием
+    hash_version: Optional[str] = Field(default=None, nullable=True, max_length=16)
+    # Положение блока в файле — get_code читает его без повторного разбора
+    start_line: Optional[int] = Field(default=None, nullable=True)
+    end_line: Optional[int] = Field(default=None, nullable=True)
+    start_byte: Optional[int] = Field(default=None, nullable=True)
+    end_byte: Optional[int] = Field(default=None, nullable=True)
+    file_hash: Optional[str] = Field(default=None, nullable=True, max_length=40)
+    # Номер карточки в репозитории по порядку появления; не меняется при
+    # пересканировании, удалённые карточки оставляют дыры
+    seq: Optional[int] = Field(default=None, nullable=True)
+    # Плотный номер 0..N-1 для случайного выбора карточки: в отличие от seq
+    # перенумеровывается после удаления карточек, чтобы не оставалось дыр
+    pick_seq: Optional[int] = Field(default=None, nullable=True)
+    # Сигнатура функции или класса для подсказок редактора: параметры,
+    # возвращаемый тип, базовые классы и первая строка документации
+    signature: Optional[Dict] = Field(
+        default=None, sa_column=Column(JSONB, nullable=True)
+    )
+    # Находки анализаторов: [{"analyzer", "severity", "message"}], из них
+    # собраны severity и error_message
+    findings: Optional[List[Dict]] = Field(
+        default=None, sa_column=Column(JSONB, nullable=True)
+    )
 
 
 class CardResponse(CardBase):
     id: UUID
 
 
+class CardPage(SQLModel):
+    items: list[CardResponse]
+    next_cursor: Optional[str] = None
+
+
 class CardCodeRequest(SQLModel):
     repository_id: UUID
     file_path: str
@@ -64,6 +144,40 @@ class CardCodeRequest(SQLModel):
 
 
 class CardCodeResponse(CardBase):
+    id: UUID
     start_line: int
     end_line: int
     code: str
+
+
+class SignatureLookupRequest(SQLModel):
+    repository_id: UUID
+    # Файл, открытый в редакторе: имена разрешаются по его импортам
+    file_path: str
+    # Имена так, как они записаны в коде (scanner.read_codes, Card)
+    names: List[str] = Field(max_length=500)
+
+
+class CardSignature(SQLModel):
+    # Запрошенное имя
+    name: str
+    id: UUID
+    file_path: str
+    kind: str
+    full_name: str
+    signature: Optional[Dict] = None
+
+
+class CardDuplicate(CardResponse):
+    similarity: float
+
+
+class DuplicateCluster(SQLModel):
+    # Минимальная оценённая похожесть среди связей кластера (1.0 — точные копии)
+    similarity: float
+    items: list[CardResponse]
+
+
+class CardFeedResponse(SQLModel):
+    items: list[CardCodeResponse]
+    next_cursor: Optional[int] = None
@@ -0,0 +1,85 @@
+from typing import Optional
+from uuid import UUID, uuid4
+from sqlmodel import Field, Index, SQLModel, text
+
+from .cards import CardResponse
+
+
+class FileImport(SQLModel, table=True):
+    """Импорт в файле репозитория, разрешённый в файл, где определён модуль"""
+
+    __table_args__ = (
+        Index("ix_fileimport_repository_file", "repository_id", "file_path"),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    repository_id: UUID = Field(foreign_key="repository.id", nullable=False)
+    file_path: str = Field(nullable=False)
+    line: int = Field(nullable=False)
+    # Абсолютное имя модуля (относительные импорты уже разрешены)
+    module: str = Field(nullable=False)
+    # Имя из from-импорта; None для import module
+    name: Optional[str] = Field(default=None, nullable=True)
+    alias: Optional[str] = Field(default=None, nullable=True)
+    # Импорт внутри функции или класса, а не в начале файла
+    is_local: bool = Field(default=False)
+    # Импортирован модуль (import a.b, from pkg import module), а не имя из него
+    is_module: bool = Field(
+        default=False, sa_column_kwargs={"server_default": text("false")}
+    )
+    # Файл модуля в репозитории; None — внешняя библиотека
+    target_file: Optional[str] = Field(default=None, nullable=True)
+
+
+class CardReference(SQLModel, table=True):
+    """Ссылка сущности на имя, которое может быть другой карточкой.
+
+    Концы хранятся ключами карточек (file_path, full_name), а не id: цель
+    может появиться или исчезнуть при следующем сканировании, и запрос
+    зависимостей соединяет ссылки с карточками, существующими сейчас.
+    """
+
+    __table_args__ = (
+        # Зависимости карточки
+        Index("ix_cardreference_source", "repository_id", "file_path", "full_name"),
+        # Обратный поиск — кто использует карточку
+        Index(
+            "ix_cardreference_target",
+            "repository_id",
+            "target_file",
+            "target_name",
+        ),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    repository_id: UUID = Field(foreign_key="repository.id", nullable=False)
+    file_path: str = Field(nullable=False)
+    full_name: str = Field(nullable=False)
+    # Имя так, как оно записано в коде (например, scanner.read_codes)
+    name: str = Field(nullable=False)
+    target_file: str = Field(nullable=False)
+    target_name: str = Field(nullable=False)
+
+
+class FileImportResponse(SQLModel):
+    line: int
+    module: str
+    name: Optional[str] = None
+    alias: Optional[str] = None
+    is_local: bool
+    is_module: bool = False
+    target_file: Optional[str] = None
+
+
+class CardReferenceResponse(CardResponse):
+    # Имя, через которое карточка используется в коде
+    name: str
+
+
+class CardDependencies(SQLModel):
+    # Импорты в начале файла карточки и внутри неё самой
+    imports: list[FileImportResponse]
+    # Карточки, на которые ссылается код карточки
+    references: list[CardReferenceResponse]
+    # Карточки, которые ссылаются на эту
+    used_by: list[CardReferenceResponse]
@@ -0,0 +1,30 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from uuid import UUID
+from sqlmodel import SQLModel
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    cloning = "cloning"
+    scanning = "scanning"
+    done = "done"
+    failed = "failed"
+
+
+class JobResponse(SQLModel):
+    id: UUID
+    repo_full_name: str
+    # Ревизия для сканирования; None — текущая ветка клона
+    rev: Optional[str] = None
+    status: JobStatus
+    repository_id: Optional[UUID] = None
+    files_discovered: int = 0
+    files_parsed: int = 0
+    entities_found: int = 0
+    cards_committed: int = 0
+    batches_committed: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
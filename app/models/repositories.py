@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from typing import Optional
 from uuid import UUID, uuid4
-from sqlmodel import Field, SQLModel, text
+from sqlmodel import Field, Index, SQLModel, text
 from enum import Enum
 
 
@@ -17,6 +17,9 @@ class RepositoryStatus(str, Enum):
 
 
 class Repository(SQLModel, table=True):
+    # Keyset-пагинация списка репозиториев
+    __table_args__ = (Index("ix_repository_created_id", "created_at", "id"),)
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     owner_id: Optional[int] = Field(foreign_key="user.id", default=None)
     is_public_template: bool = Field(default=True)
@@ -24,6 +27,7 @@ class Repository(SQLModel, table=True):
     branch_name: str = Field(nullable=False)
     commit_name: str = Field(nullable=False)
     status: RepositoryStatus = Field(nullable=False)
+    last_scanned_commit: Optional[str] = Field(default=None, nullable=True)
 
     updated_at: datetime = Field(
         default_factory=utcnow,
@@ -37,7 +41,14 @@ class Repository(SQLModel, table=True):
 
 class RepositoryCreate(SQLModel):
     repo_full_name: str
+    # Ветка/тег/коммит для сканирования из git без рабочего дерева
+    rev: Optional[str] = None
 
 
 class RepositoryResponse(SQLModel):
     message: str
+
+
+class RepositoryPage(SQLModel):
+    items: list[Repository]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,64 @@
+from datetime import datetime
+from enum import Enum as PyEnum
+from typing import Optional
+from uuid import UUID, uuid4
+from sqlmodel import Field, Index, SQLModel, UniqueConstraint, text
+
+from .cards import CardStatus, utcnow
+
+
+class SwipeActionType(str, PyEnum):
+    approve = "approve"
+    skip = "skip"
+    edit = "edit"
+    like = "like"
+
+
+# Статус, который получает карточка после свайпа. Лайк — тоже «код хорош»:
+# карточка одобрена, а сохранение в избранное к статусу не относится
+SWIPE_STATUSES = {
+    SwipeActionType.approve: CardStatus.approved,
+    SwipeActionType.skip: CardStatus.skipped,
+    SwipeActionType.edit: CardStatus.edited,
+    SwipeActionType.like: CardStatus.approved,
+}
+
+
+class SwipeAction(SQLModel, table=True):
+    """Применённый свайп.
+
+    Ключ идемпотентности уникален в пределах карточки и не даёт повтору
+    запроса клиентом применить действие второй раз — даже после
+    перезапуска или в другом процессе. Внешнего ключа на карточку нет:
+    карточки удаляются пересканированием, а журнал остаётся.
+    """
+
+    __table_args__ = (
+        UniqueConstraint("card_id", "idempotency_key", name="uq_swipeaction_card_key"),
+        Index("ix_swipeaction_card_created", "card_id", "created_at"),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    idempotency_key: str = Field(nullable=False, max_length=100)
+    card_id: UUID = Field(nullable=False)
+    action: SwipeActionType = Field(nullable=False)
+    # Время свайпа на сервере, а не записи в БД
+    created_at: datetime = Field(
+        default_factory=utcnow,
+        sa_column_kwargs={"server_default": text("CURRENT_TIMESTAMP")},
+    )
+
+
+class SwipeRequest(SQLModel):
+    action: SwipeActionType
+    # Ключ идемпотентности, если клиент не передаёт заголовок Idempotency-Key
+    idempotency_key: Optional[str] = Field(default=None, min_length=1, max_length=100)
+
+
+class SwipeResponse(SQLModel):
+    card_id: UUID
+    action: SwipeActionType
+    status: CardStatus
+    idempotency_key: str
+    # Повтор уже принятого запроса: действие не применяется второй раз
+    duplicate: bool = False
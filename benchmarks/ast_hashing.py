@@ -0,0 +1,81 @@
+"""Сравнение хэширования сущностей: normalize_python_ast + ast.unparse на
+каждую сущность против одного прохода Merkle-хэширования.
+
+Запуск из корня репозитория:
+    python benchmarks/ast_hashing.py [--depth 4] [--methods 40] [--repeat 3]
+"""
+
+import argparse
+import ast
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from generators import nested_module  # noqa: E402
+from core.parsers.python_parser import (  # noqa: E402
+    _StructureHasher,
+    _iter_python_entities,
+    extract_python_entities_from_source,
+    normalize_python_ast,
+)
+
+
+def legacy_hashes(source: str) -> int:
+    """Прежняя схема: нормализация и unparse поддерева каждой сущности"""
+    tree = ast.parse(source)
+    count = 0
+    for entity in _iter_python_entities(tree):
+        normalized = normalize_python_ast(entity["node"])
+        hashlib.sha256(normalized.encode("utf-8")).digest()
+        count += 1
+    return count
+
+
+def single_pass_hashes(source: str) -> int:
+    tree = ast.parse(source)
+    hasher = _StructureHasher()
+    hasher.visit(tree)
+    return len(hasher.entities)
+
+
+def full_extraction(source: str) -> int:
+    return len(extract_python_entities_from_source(source))
+
+
+def best_time(fn, source: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(source)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--methods", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'глубина':>8} {'строк':>7} {'сущн.':>6} {'старый, с':>10} "
+        f"{'Merkle, с':>10} {'ускор.':>7} {'весь разбор, с':>15}"
+    )
+    for depth in range(1, args.depth + 1):
+        source = nested_module(depth, args.methods)
+        entities = single_pass_hashes(source)
+        legacy = best_time(legacy_hashes, source, args.repeat)
+        merkle = best_time(single_pass_hashes, source, args.repeat)
+        full = best_time(full_extraction, source, args.repeat)
+        print(
+            f"{depth:>8} {source.count(chr(10)):>7} {entities:>6} {legacy:>10.3f} "
+            f"{merkle:>10.3f} {legacy / merkle:>6.1f}x {full:>15.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Общие части бенчмарков: окружение приложения, статистика, RSS и базовые замеры"""
+
+import json
+import os
+import resource
+import sys
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines.json")
+
+# Метрики, у которых больше — лучше; остальные (время, память) — чем меньше, тем лучше
+HIGHER_IS_BETTER = {"throughput", "files_per_s", "entities_per_s"}
+
+
+def setup_environment(workdir: str, parse_cache: bool = False) -> Dict[str, str]:
+    """Настраивает переменные окружения приложения до импорта его модулей.
+
+    Бенчмарки всегда работают с отдельной базой BENCH_DB_NAME (по умолчанию
+    swipe_bench), чтобы не задеть рабочие данные.
+    """
+    env = {
+        "IN_DOCKER": "1",
+        "TEMP_REPO_PATH": os.path.join(workdir, "repositories"),
+        "LOG_PATH": os.path.join(workdir, "logs"),
+        "LOG_DEBUG": "false",
+        "PARSE_CACHE_ENABLED": "true" if parse_cache else "false",
+        "DB_NAME": os.environ.get("BENCH_DB_NAME", "swipe_bench"),
+    }
+    os.environ.update(env)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    return env
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль с линейной интерполяцией (q от 0 до 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_stats(latencies: List[float], duration: float) -> Dict[str, float]:
+    """Пропускная способность и p50/p99 по списку задержек в секундах"""
+    return {
+        "count": len(latencies),
+        "throughput": len(latencies) / duration if duration else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS текущего процесса и его завершённых дочерних процессов"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # В Linux ru_maxrss в килобайтах, в macOS — в байтах
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(own, children) / scale
+
+
+def process_peak_rss_mb(pid: int) -> Optional[float]:
+    """Пиковый RSS работающего процесса по /proc (только Linux)"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def load_baselines(scale: float, path: str = BASELINE_PATH) -> Dict[str, Dict]:
+    """Базовые замеры для данного масштаба репозиториев"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get(str(scale), {})
+
+
+def save_baselines(
+    results: Dict[str, Dict[str, float]], scale: float, path: str = BASELINE_PATH
+):
+    """Обновляет базовые замеры только для прогнанных кейсов этого масштаба"""
+    baselines = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            baselines = json.load(f)
+    baselines.setdefault(str(scale), {}).update(results)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baselines: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    """Сравнивает с базовыми замерами и возвращает описания регрессий"""
+    regressions = []
+    for case, metrics in sorted(results.items()):
+        baseline = baselines.get(case)
+        if not baseline:
+            continue
+        for name, value in sorted(metrics.items()):
+            base = baseline.get(name)
+            if not base or name == "count":
+                continue
+            change = (value - base) / base
+            if name in HIGHER_IS_BETTER:
+                change = -change
+            marker = "  "
+            if change > tolerance:
+                marker = "❌"
+                regressions.append(f"{case} {name}: {base:.3f} → {value:.3f}")
+            print(f"{marker} {case:<32} {name:<16} {base:>10.3f} → {value:>10.3f}")
+    return regressions
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    for case, metrics in sorted(results.items()):
+        formatted = ", ".join(
+            f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}"
+            for name, value in sorted(metrics.items())
+        )
+        print(f"{case:<32} {formatted}")
@@ -0,0 +1,115 @@
+"""Генераторы синтетических репозиториев для бенчмарков.
+
+Содержимое детерминировано: одинаковые параметры дают одинаковые файлы,
+поэтому замеры между запусками сравнимы. Имена функций включают номер
+файла — у разных файлов разные хэши, и кэш разбора их не склеивает.
+"""
+
+import os
+import subprocess
+from typing import Callable, Dict
+
+FUNCTION = '''
+def {name}(items, limit=10):
+    """Docstring {name}"""
+    total = 0
+    for index, item in enumerate(items):
+        if item.value > limit and index % 2:
+            total += item.value * {n}
+        else:
+            total -= len(str(item))
+    return {{"total": total, "name": "{name}"}}
+'''
+
+METHOD = '''
+def method_{n}(self, items, limit=10):
+    """Docstring {n}"""
+    total = 0
+    for index, item in enumerate(items):
+        if item.value > limit and index % 2:
+            total += item.value * {n}
+        else:
+            total -= len(str(item))
+    return {{"total": total, "name": "m{n}"}}
+'''
+
+
+def flat_module(functions: int, prefix: str = "func") -> str:
+    """Модуль из functions функций верхнего уровня"""
+    return "".join(FUNCTION.format(name=f"{prefix}_{n}", n=n) for n in range(functions))
+
+
+def nested_module(depth: int, methods: int, prefix: str = "") -> str:
+    """Модуль с классами, вложенными на depth уровней, по methods методов в каждом"""
+    lines = []
+    for level in range(depth):
+        indent = "    " * level
+        lines.append(f"{indent}class {prefix}Level{level}:")
+        for n in range(methods):
+            for line in METHOD.format(n=n).splitlines():
+                lines.append(f"{indent}    {line}" if line else "")
+    return "\n".join(lines) + "\n"
+
+
+def many_small(scale: float) -> Dict[str, str]:
+    """Много маленьких файлов — упор в обход, открытие файлов и запись в БД"""
+    count = max(1, int(2000 * scale))
+    return {
+        f"pkg_{i // 100}/module_{i}.py": flat_module(5, prefix=f"f{i}")
+        for i in range(count)
+    }
+
+
+def few_huge(scale: float) -> Dict[str, str]:
+    """Несколько огромных файлов — упор в разбор одного файла"""
+    functions = max(1, int(3000 * scale))
+    return {f"huge_{i}.py": flat_module(functions, prefix=f"h{i}") for i in range(3)}
+
+
+def deep_nested(scale: float) -> Dict[str, str]:
+    """Глубоко вложенные классы — упор в обработку вложенных сущностей"""
+    count = max(1, int(20 * scale))
+    return {
+        f"nested_{i}.py": nested_module(8, 20, prefix=f"N{i}") for i in range(count)
+    }
+
+
+PROFILES: Dict[str, Callable[[float], Dict[str, str]]] = {
+    "many_small": many_small,
+    "few_huge": few_huge,
+    "deep_nested": deep_nested,
+}
+
+
+def write_repo(root: str, files: Dict[str, str]) -> str:
+    """Записывает файлы и делает из папки git-репозиторий с одним коммитом"""
+    os.makedirs(root, exist_ok=True)
+    for rel_path, content in files.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def git(*args):
+        subprocess.run(["git", *args], cwd=root, check=True, capture_output=True)
+
+    git("init", "-q")
+    git("add", "-A")
+    git(
+        "-c",
+        "user.name=bench",
+        "-c",
+        "user.email=bench@localhost",
+        "commit",
+        "-q",
+        "-m",
+        "synthetic",
+    )
+    return root
+
+
+def generate_repo(profile: str, root: str, scale: float = 1.0) -> str:
+    """Создаёт репозиторий профиля в root, если его там ещё нет"""
+    if os.path.isdir(os.path.join(root, ".git")):
+        return root
+    return write_repo(root, PROFILES[profile](scale))
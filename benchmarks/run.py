@@ -0,0 +1,451 @@
+"""Набор бенчмарков сканирования и выдачи карточек.
+
+Наборы:
+    parse — extract_python_entities, normalize_python_ast и
+            find_python_entity_block на синтетических файлах (без БД);
+    scan  — scan_repo: первое сканирование и повторное без изменений
+            (--streaming — в потоковом режиме сверки карточек);
+    http  — нагрузочный тест /cards/repo/{id}/random и /feed через uvicorn.
+
+scan и http работают с PostgreSQL из настроек DB_* приложения, но всегда с
+базой BENCH_DB_NAME (по умолчанию swipe_bench). Для замеров подойдёт
+временный контейнер:
+    docker run --rm -p 5432:5432 -e POSTGRES_USER=admin \\
+        -e POSTGRES_PASSWORD=strong_password -e POSTGRES_DB=swipe_bench postgres:16
+
+Каждый кейс выполняется в отдельном процессе, чтобы пиковый RSS относился
+только к нему. Примеры (из корня репозитория):
+    python benchmarks/run.py --suite parse --scale 0.25
+    python benchmarks/run.py --suite scan http --compare
+    python benchmarks/run.py --suite scan --profile many_small --streaming
+    python benchmarks/run.py --suite parse --save-baseline
+"""
+
+import argparse
+import contextlib
+import http.client
+import importlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from common import (
+    APP_DIR,
+    compare,
+    latency_stats,
+    load_baselines,
+    peak_rss_mb,
+    print_results,
+    process_peak_rss_mb,
+    save_baselines,
+    setup_environment,
+)
+from generators import PROFILES, generate_repo
+
+SUITES = ("parse", "scan", "http")
+# Сколько вызовов find_python_entity_block делать на профиль
+FIND_BLOCK_SAMPLES = 200
+# Профиль, которым наполняется база для HTTP-тестов
+HTTP_PROFILE = "many_small"
+
+
+def _repo_root(workdir: str, profile: str) -> str:
+    return os.path.join(workdir, "repositories", "bench", profile)
+
+
+def _python_files(root: str) -> List[str]:
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != ".git"]
+        paths.extend(os.path.join(dirpath, name) for name in filenames)
+    return sorted(p for p in paths if p.endswith(".py"))
+
+
+def run_parse(profile: str, workdir: str, args) -> Dict[str, Dict[str, float]]:
+    import ast
+
+    from core.parsers.python_parser import (
+        extract_python_entities,
+        find_python_entity_block,
+        normalize_python_ast,
+    )
+    from core.parsers.source_cache import SourceCache
+
+    files = _python_files(
+        generate_repo(profile, _repo_root(workdir, profile), args.scale)
+    )
+    results = {}
+
+    latencies, entities = [], []
+    started = time.perf_counter()
+    for path in files:
+        t0 = time.perf_counter()
+        found = extract_python_entities(path)
+        latencies.append(time.perf_counter() - t0)
+        entities.extend((path, ent["kind"], ent["full_name"]) for ent in found)
+    duration = time.perf_counter() - started
+    stats = latency_stats(latencies, duration)
+    results[f"parse/{profile}/extract"] = {
+        "files_per_s": stats["throughput"],
+        "entities_per_s": len(entities) / duration,
+        "p50_ms": stats["p50_ms"],
+        "p99_ms": stats["p99_ms"],
+    }
+
+    latencies = []
+    started = time.perf_counter()
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                t0 = time.perf_counter()
+                normalize_python_ast(node)
+                latencies.append(time.perf_counter() - t0)
+    results[f"parse/{profile}/normalize"] = latency_stats(
+        latencies, time.perf_counter() - started
+    )
+
+    step = max(1, len(entities) // FIND_BLOCK_SAMPLES)
+    sample = entities[::step][:FIND_BLOCK_SAMPLES]
+    cache = SourceCache(max_entries=256, max_bytes=256 * 1024 * 1024)
+    for name, block_cache in (("find_block", None), ("find_block_cached", cache)):
+        latencies = []
+        started = time.perf_counter()
+        for path, kind, full_name in sample:
+            t0 = time.perf_counter()
+            find_python_entity_block(path, kind, full_name, cache=block_cache)
+            latencies.append(time.perf_counter() - t0)
+        results[f"parse/{profile}/{name}"] = latency_stats(
+            latencies, time.perf_counter() - started
+        )
+
+    rss = peak_rss_mb()
+    for metrics in results.values():
+        metrics["peak_rss_mb"] = rss
+    return results
+
+
+def _prepare_repository(profile: str, workdir: str, scale: float):
+    """Создаёт схему, синтетический репозиторий и запись Repository для него"""
+    from sqlmodel import Session, SQLModel, select
+
+    # Импорт пакета регистрирует все таблицы в metadata
+    importlib.import_module("models")
+    from db.session import engine
+    from models.repositories import Repository, RepositoryStatus
+
+    SQLModel.metadata.create_all(engine)
+    root = generate_repo(profile, _repo_root(workdir, profile), scale)
+    with Session(engine) as db:
+        repo = db.exec(
+            select(Repository).where(Repository.repo_full_name == f"bench/{profile}")
+        ).first()
+        if repo is None:
+            repo = Repository(
+                repo_full_name=f"bench/{profile}",
+                branch_name="main",
+                commit_name="synthetic",
+                status=RepositoryStatus.active,
+            )
+            db.add(repo)
+            db.commit()
+            db.refresh(repo)
+        return root, repo.id
+
+
+def _scan(
+    root: str,
+    repository_id,
+    workers: int,
+    quiet: bool = True,
+    streaming: bool = False,
+) -> float:
+    from sqlmodel import Session
+
+    from core.parsers import scanner
+    from db.session import engine
+
+    with Session(engine) as db, open(os.devnull, "w") as devnull:
+        redirect = (
+            contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext()
+        )
+        with redirect:
+            started = time.perf_counter()
+            scanner.scan_repo(
+                root,
+                repository_id=repository_id,
+                db=db,
+                workers=workers,
+                streaming=streaming,
+            )
+            return time.perf_counter() - started
+
+
+def run_scan(profile: str, workdir: str, args) -> Dict[str, Dict[str, float]]:
+    from sqlmodel import Session, delete, func, select
+
+    from db.session import engine
+    from models.cards import Card
+    from models.repositories import Repository
+
+    root, repository_id = _prepare_repository(profile, workdir, args.scale)
+    with Session(engine) as db:
+        db.exec(delete(Card).where(Card.repository_id == repository_id))
+        repo = db.get(Repository, repository_id)
+        repo.last_scanned_commit = None
+        db.add(repo)
+        db.commit()
+
+    workers = args.workers
+    cold = _scan(root, repository_id, workers, streaming=args.streaming)
+    with Session(engine) as db:
+        cards = db.exec(
+            select(func.count()).where(Card.repository_id == repository_id)
+        ).one()
+    unchanged = _scan(root, repository_id, workers, streaming=args.streaming)
+
+    rss = peak_rss_mb()
+    files = len(_python_files(root))
+    name = f"scan/{profile}/streaming" if args.streaming else f"scan/{profile}"
+    return {
+        f"{name}/cold": {
+            "seconds": cold,
+            "files_per_s": files / cold,
+            "entities_per_s": cards / cold,
+            "peak_rss_mb": rss,
+        },
+        f"{name}/unchanged": {
+            "seconds": unchanged,
+            "files_per_s": files / unchanged,
+            "peak_rss_mb": rss,
+        },
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(port: int, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Сервер завершился при запуске")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Сервер не запустился")
+
+
+def _load(port: int, path: str, total: int, concurrency: int) -> Dict[str, float]:
+    """Отправляет total запросов GET из concurrency потоков с keep-alive"""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(count: int):
+        nonlocal errors
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local, failed = [], 0
+        for _ in range(count):
+            t0 = time.perf_counter()
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            local.append(time.perf_counter() - t0)
+            if response.status != 200:
+                failed += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    per_worker = [total // concurrency] * concurrency
+    for i in range(total % concurrency):
+        per_worker[i] += 1
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, per_worker))
+    stats = latency_stats(latencies, time.perf_counter() - started)
+    stats["errors"] = errors
+    return stats
+
+
+def run_http(profile: str, workdir: str, args) -> Dict[str, Dict[str, float]]:
+    from sqlmodel import Session, func, select
+
+    from db.session import engine
+    from models.cards import Card
+
+    root, repository_id = _prepare_repository(profile, workdir, args.scale)
+    with Session(engine) as db:
+        cards = db.exec(
+            select(func.count()).where(Card.repository_id == repository_id)
+        ).one()
+    if not cards:
+        _scan(root, repository_id, args.workers)
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=APP_DIR,
+        env=os.environ.copy(),
+    )
+    try:
+        _wait_for_server(port, server)
+        paths = {
+            "random": f"/cards/repo/{repository_id}/random",
+            "random_weighted": f"/cards/repo/{repository_id}/random"
+            "?exclude_reviewed=true&weighted=true",
+            "feed": f"/cards/repo/{repository_id}/feed?limit=10",
+        }
+        results = {}
+        for name, path in paths.items():
+            _load(port, path, min(100, args.requests), args.concurrency)  # прогрев
+            results[f"http/{name}"] = _load(port, path, args.requests, args.concurrency)
+        server_rss = process_peak_rss_mb(server.pid)
+        if server_rss is not None:
+            for metrics in results.values():
+                metrics["server_peak_rss_mb"] = server_rss
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+RUNNERS = {"parse": run_parse, "scan": run_scan, "http": run_http}
+
+
+def run_case(suite: str, profile: str, args) -> Dict[str, Dict[str, float]]:
+    """Запускает кейс в отдельном процессе и возвращает его метрики"""
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--case",
+        suite,
+        profile,
+        "--workdir",
+        args.workdir,
+        "--scale",
+        str(args.scale),
+        "--workers",
+        str(args.workers),
+        "--requests",
+        str(args.requests),
+        "--concurrency",
+        str(args.concurrency),
+    ]
+    if args.streaming:
+        command.append("--streaming")
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines() or ["нет вывода"]
+        # Последняя строка трейсбека с типом исключения, без подсказок SQLAlchemy
+        errors = [line for line in lines if "Error" in line or "Exception" in line]
+        raise RuntimeError((errors or lines)[-1])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Бенчмарки сканирования и выдачи карточек",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument(
+        "--profile", nargs="+", choices=list(PROFILES), default=list(PROFILES)
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Множитель размера репозиториев"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="SCAN_WORKERS для scan_repo"
+    )
+    parser.add_argument(
+        "--streaming", action="store_true", help="Потоковый режим scan_repo"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--workdir", help="Папка для репозиториев (по умолчанию временная)"
+    )
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--compare", action="store_true", help="Сравнить с baselines.json"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Допустимое ухудшение (0.2 = 20%%)"
+    )
+    parser.add_argument(
+        "--case", nargs=2, metavar=("SUITE", "PROFILE"), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.case:
+        suite, profile = args.case
+        setup_environment(args.workdir)
+        print(json.dumps(RUNNERS[suite](profile, args.workdir, args)))
+        return
+
+    temp_dir = None
+    if not args.workdir:
+        temp_dir = tempfile.TemporaryDirectory(prefix="swipe-bench-")
+        args.workdir = temp_dir.name
+
+    results: Dict[str, Dict[str, float]] = {}
+    failed = False
+    for suite in args.suite:
+        profiles = [HTTP_PROFILE] if suite == "http" else args.profile
+        for profile in profiles:
+            print(f"▶ {suite}/{profile}", flush=True)
+            try:
+                results.update(run_case(suite, profile, args))
+            except RuntimeError as e:
+                failed = True
+                print(f"  ❌ {suite}/{profile}: {e}", flush=True)
+
+    print()
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        save_baselines(results, args.scale)
+    if args.compare:
+        print()
+        regressions = compare(results, load_baselines(args.scale), args.tolerance)
+        if regressions:
+            print(f"\nРегрессий: {len(regressions)}")
+            failed = True
+    if temp_dir is not None:
+        temp_dir.cleanup()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
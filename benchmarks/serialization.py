@@ -0,0 +1,131 @@
+"""Процессорное время на сериализацию ответов с карточками: прежний путь
+(card.dict() → модель ответа → валидация и сериализация FastAPI по
+response_model) против сборки словаря и orjson.
+
+Запуск из корня репозитория:
+    python benchmarks/serialization.py [--code-kb 2 20] [--page 50] [--repeat 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import warnings
+from uuid import uuid4
+
+from common import setup_environment
+
+setup_environment(tempfile.mkdtemp(prefix="swipe-bench-"))
+
+from fastapi.routing import serialize_response  # noqa: E402
+
+from api import cards as cards_api  # noqa: E402
+from core.serialization import (  # noqa: E402
+    ORJSONResponse,
+    card_code_to_dict,
+    cards_to_dicts,
+)
+from models.cards import (  # noqa: E402
+    Card,
+    CardCodeResponse,
+    CardPage,
+    CardSeverity,
+    CardStatus,
+)
+
+
+def make_card(n: int) -> Card:
+    return Card(
+        id=uuid4(),
+        repository_id=uuid4(),
+        file_path=f"pkg/module_{n}.py",
+        kind="function",
+        full_name=f"func_{n}",
+        error_message="Слишком большая функция: 60 инструкций (порог 40)",
+        severity=CardSeverity.medium,
+        status=CardStatus.needs_review,
+        gist_url="",
+        ast_hash=os.urandom(32),
+        minhash=os.urandom(512),
+        lsh_bands=list(range(16)),
+        start_line=1,
+        end_line=40,
+        seq=n,
+    )
+
+
+def response_field(path: str):
+    for route in cards_api.router.routes:
+        if route.path == path:
+            return route.response_field
+    raise ValueError(f"Маршрут не найден: {path}")
+
+
+async def legacy_card(card: Card, code: dict, field) -> bytes:
+    # Так собирали ответ эндпоинты до перехода на orjson
+    response = CardCodeResponse(**{**card.dict(), **code})
+    return await serialize_response(
+        field=field, response_content=response, dump_json=True
+    )
+
+
+async def fast_card(card: Card, code: dict, field) -> bytes:
+    return ORJSONResponse(card_code_to_dict(card, code)).body
+
+
+async def legacy_page(cards: list, field) -> bytes:
+    page = CardPage(items=cards, next_cursor="cursor")
+    return await serialize_response(field=field, response_content=page, dump_json=True)
+
+
+async def fast_page(cards: list, field) -> bytes:
+    return ORJSONResponse(
+        {"items": cards_to_dicts(cards), "next_cursor": "cursor"}
+    ).body
+
+
+async def cpu_per_call(fn, args, repeat: int) -> float:
+    """Процессорное время одного вызова в микросекундах"""
+    await fn(*args)
+    started = time.process_time()
+    for _ in range(repeat):
+        await fn(*args)
+    return (time.process_time() - started) / repeat * 1e6
+
+
+async def run(args):
+    card_field = response_field("/cards/{card_id}")
+    page_field = response_field("/cards/")
+
+    print(f"{'ответ':<24} {'прежний, мкс':>13} {'orjson, мкс':>12} {'ускор.':>7}")
+    for code_kb in args.code_kb:
+        card = make_card(0)
+        code = {"start_line": 1, "end_line": 40, "code": "x = 1\n" * (code_kb * 170)}
+        legacy = await cpu_per_call(legacy_card, (card, code, card_field), args.repeat)
+        fast = await cpu_per_call(fast_card, (card, code, card_field), args.repeat)
+        name = f"карточка, код {code_kb} КБ"
+        print(f"{name:<24} {legacy:>13.1f} {fast:>12.1f} {legacy / fast:>6.1f}x")
+
+    cards = [make_card(n) for n in range(args.page)]
+    repeat = max(1, args.repeat // 10)
+    legacy = await cpu_per_call(legacy_page, (cards, page_field), repeat)
+    fast = await cpu_per_call(fast_page, (cards, page_field), repeat)
+    name = f"список, {args.page} карточек"
+    print(f"{name:<24} {legacy:>13.1f} {fast:>12.1f} {legacy / fast:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--code-kb", type=int, nargs="+", default=[2, 20])
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    # card.dict() прежнего пути устарел в SQLModel — не засоряем вывод
+    warnings.simplefilter("ignore", DeprecationWarning)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())